@@ -0,0 +1,297 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from snapshot import file_version
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# --------------------------------------------------
+# Columnar ratings dataset for GET /analytics
+# --------------------------------------------------
+ENABLED = os.getenv("ANALYTICS_ENABLED", "1") == "1"
+PATH = os.getenv("ANALYTICS_PATH", os.path.join("snapshot", "ratings.bin"))
+# How often worker.py rebuilds the file when marks, films or users changed
+REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+# How often an API worker checks whether the file was replaced
+CHECK_SECONDS = float(os.getenv("ANALYTICS_CHECK_SECONDS", "5"))
+# Rows fetched per round trip while building
+BUILD_CHUNK = int(os.getenv("ANALYTICS_BUILD_CHUNK", "100000"))
+# Above this many possible keys, groups are found by sorting instead of counting
+MAX_DENSE_GROUPS = int(os.getenv("ANALYTICS_MAX_DENSE_GROUPS", "10000000"))
+
+# File layout, little-endian:
+#   header      magic, version, position, build time, row count, langues size
+#   langues     JSON list of the distinct Utilisateur.langue values, padded to 8 bytes
+#   columns     one array per column of COLUMNS, in that order
+MAGIC = b"FRAT"
+VERSION = 1
+HEADER = struct.Struct("<4sIqdQI4x")
+COLUMNS = (
+    ("film", "<i4"),
+    ("user", "<i4"),
+    ("director", "<i4"),  # -1: film without director
+    ("year", "<i2"),
+    ("langue", "<i2"),  # index in the langues list
+    ("mark", "i1"),
+)
+NO_DIRECTOR = -1
+MARK_BINS = 11  # marks 0 to 10
+
+RATINGS_SQL = text(
+    "SELECT m.id_film, m.id_user, f.id_director, f.annee, u.langue, m.mark "
+    "FROM mark m JOIN film f ON f.id = m.id_film JOIN utilisateurs u ON u.id = m.id_user "
+    "WHERE m.mark BETWEEN 0 AND 10"
+)
+
+GROUPS = ("decade", "year", "director", "langue", "film", "user")
+SORTS = ("key", "votes", "mean")
+
+
+# --------------------------------------------------
+# Builder
+# --------------------------------------------------
+def build_dataset(conn, position, path=PATH):
+    """Write every rating with its film, director and user columns to `path`, atomically.
+
+    position is the change feed position the marks were read at, as in
+    snapshot.build_snapshot. Rows are streamed in BUILD_CHUNK slices, so only
+    the finished arrays are held in memory.
+    """
+    langues = {}
+    chunks = {name: [] for name, _ in COLUMNS}
+    result = conn.execution_options(stream_results=True).execute(RATINGS_SQL)
+    for rows in result.partitions(BUILD_CHUNK):
+        film, user, director, year, langue, mark = zip(*rows)
+        chunks["film"].append(np.array(film, dtype=np.int32))
+        chunks["user"].append(np.array(user, dtype=np.int32))
+        chunks["director"].append(np.array(
+            [NO_DIRECTOR if d is None else d for d in director], dtype=np.int32
+        ))
+        chunks["year"].append(np.array(year, dtype=np.int16))
+        chunks["langue"].append(np.array([langues.setdefault(l, len(langues)) for l in langue], dtype=np.int16))
+        chunks["mark"].append(np.array(mark, dtype=np.int8))
+
+    columns = {
+        name: np.concatenate(chunks[name]).astype(dtype) if chunks[name] else np.empty(0, dtype)
+        for name, dtype in COLUMNS
+    }
+    count = len(columns["mark"])
+    names = json.dumps(list(langues)).encode()
+    names += b" " * (-len(names) % 8)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, position, time.time(), count, len(names)))
+        f.write(names)
+        for name, _ in COLUMNS:
+            f.write(columns[name].tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_position(path=PATH):
+    """Change feed position of the dataset on disk, None without a valid file"""
+    try:
+        with open(path, "rb") as f:
+            magic, version, position, *_ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return position if magic == MAGIC and version == VERSION else None
+
+
+# --------------------------------------------------
+# Reader
+# --------------------------------------------------
+class _Ratings:
+    """One mapped dataset file: a read-only NumPy array per column"""
+
+    def __init__(self, f):
+        self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, built_at, count, names_size = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("unsupported ratings dataset")
+        self.built_at = datetime.fromtimestamp(built_at, timezone.utc)
+        self.langues = json.loads(self.mm[HEADER.size:HEADER.size + names_size])
+        self.count = count
+
+        offset = HEADER.size + names_size
+        for name, dtype in COLUMNS:
+            column = np.frombuffer(self.mm, dtype=dtype, count=count, offset=offset)
+            setattr(self, name, column)
+            offset += column.nbytes
+
+
+class RatingsDataset:
+    """Lazily mapped dataset, remapped when worker.py replaced the file.
+
+    current() returns None without NumPy or a usable file. The pages are
+    shared by every process mapping the file.
+    """
+
+    def __init__(self, path=PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ratings = None
+        self._version = None
+        self._pid = None
+        self._checked = 0.0
+
+    def current(self):
+        if not ENABLED or np is None:
+            return None
+        now = time.monotonic()
+        if self._pid == os.getpid() and now - self._checked < CHECK_SECONDS:
+            return self._ratings
+        with self._lock:
+            if self._pid != os.getpid() or now - self._checked >= CHECK_SECONDS:
+                self._checked = now
+                self._pid = os.getpid()
+                self._remap_if_replaced()
+        return self._ratings
+
+    def _remap_if_replaced(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._ratings, self._version = None, None
+            return
+        if file_version(stat) == self._version:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                ratings = _Ratings(f)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️ Ratings dataset unusable: {e}")
+            self._ratings, self._version = None, None
+            return
+        self._ratings, self._version = ratings, file_version(stat)
+
+
+# --------------------------------------------------
+# Aggregates
+# --------------------------------------------------
+def select(ratings, director=None, langue=None, year_from=None, year_to=None):
+    """Boolean mask of the ratings matching the filters, None when there is none"""
+    mask = None
+
+    def add(condition):
+        nonlocal mask
+        mask = condition if mask is None else mask & condition
+
+    if director is not None:
+        add(ratings.director == director)
+    if langue is not None:
+        if langue not in ratings.langues:
+            return np.zeros(ratings.count, dtype=bool)
+        add(ratings.langue == ratings.langues.index(langue))
+    if year_from is not None:
+        add(ratings.year >= year_from)
+    if year_to is not None:
+        add(ratings.year <= year_to)
+    return mask
+
+
+def group_keys(ratings, group):
+    """Key of every rating for `group`, and the mask of the ratings that have one"""
+    if group == "decade":
+        return ratings.year // 10 * 10, None
+    if group == "director":
+        return ratings.director, ratings.director != NO_DIRECTOR
+    return getattr(ratings, group), None
+
+
+def summary(marks):
+    """Votes, mean, standard deviation and histogram of a mark array"""
+    histogram = np.bincount(marks, minlength=MARK_BINS)
+    votes = int(histogram.sum())
+    values = np.arange(MARK_BINS)
+    mean = float(histogram @ values) / votes if votes else None
+    stddev = float(np.sqrt(max(histogram @ values ** 2 / votes - mean ** 2, 0))) if votes else None
+    return {
+        "votes": votes,
+        "mean": round(mean, 3) if mean is not None else None,
+        "stddev": round(stddev, 3) if stddev is not None else None,
+        "histogram": histogram.tolist(),
+    }
+
+
+def aggregate(ratings, group, mask=None, sort="key", min_votes=1, limit=100, histogram=False):
+    """Per-group votes, mean and standard deviation of the ratings in mask.
+
+    Each group is an index into counting arrays (np.bincount), so the cost is
+    a few passes over the selected ratings whatever the number of groups.
+    Returns the overall summary, the number of groups with at least min_votes
+    ratings and the first `limit` of them in `sort` order.
+    """
+    keys, has_key = group_keys(ratings, group)
+    if has_key is not None:
+        mask = has_key if mask is None else mask & has_key
+    marks = ratings.mark if mask is None else ratings.mark[mask]
+    keys = keys if mask is None else keys[mask]
+    overall = summary(marks)
+    if not len(marks):
+        return overall, 0, []
+
+    low = int(keys.min())
+    span = int(keys.max()) - low + 1
+    if span <= MAX_DENSE_GROUPS:
+        index = keys.astype(np.int64) - low
+        present = np.flatnonzero(np.bincount(index, minlength=span))
+        labels = present + low
+    else:
+        labels, index = np.unique(keys, return_inverse=True)
+        present, span = None, len(labels)
+
+    counts = np.bincount(index, minlength=span)
+    values = marks.astype(np.float64)
+    sums = np.bincount(index, weights=values, minlength=span)
+    squares = np.bincount(index, weights=values * values, minlength=span)
+    hist = None
+    if histogram:
+        hist = np.bincount(index * MARK_BINS + marks, minlength=span * MARK_BINS).reshape(span, MARK_BINS)
+    if present is not None:
+        counts, sums, squares = counts[present], sums[present], squares[present]
+        hist = hist[present] if hist is not None else None
+
+    means = sums / counts
+    stddevs = np.sqrt(np.maximum(squares / counts - means * means, 0))
+
+    kept = np.flatnonzero(counts >= min_votes)
+    if sort == "votes":
+        order = kept[np.argsort(-counts[kept], kind="stable")]
+    elif sort == "mean":
+        order = kept[np.argsort(-means[kept], kind="stable")]
+    else:
+        order = kept
+    order = order[:limit]
+
+    names = ratings.langues if group == "langue" else None
+    groups = []
+    for i, label, votes, mean, stddev in zip(
+        order.tolist(), labels[order].tolist(), counts[order].tolist(),
+        means[order].tolist(), stddevs[order].tolist(),
+    ):
+        item = {
+            "key": names[label] if names is not None else label,
+            "votes": votes,
+            "mean": round(mean, 3),
+            "stddev": round(stddev, 3),
+        }
+        if hist is not None:
+            item["histogram"] = hist[i].tolist()
+        groups.append(item)
+    return overall, len(kept), groups
@@ -1,35 +1,63 @@
 import os
 import json
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
 from datetime import datetime
 
+from compression import init_compression
+from database import database_url, engine_options, tune_sqlite
+from edge import MAX_AGE as CORS_MAX_AGE, init_edge
+from routing import RoutingSession, init_routing, replica_binds
+
 # Load environment variables from .env file
 load_dotenv()
 
 # --------------------------------------------------
 # Configuration Flask & Base de données
 # --------------------------------------------------
-app = Flask(__name__)
-
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Extensions are bound to an application in create_app()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+api = Blueprint("api", __name__)
+
+
+def create_app(config=None):
+    """Build the Flask application without opening any database connection,
+    so it can be preloaded in the gunicorn master (see gunicorn.conf.py)"""
+    app = Flask(__name__)
 
-db = SQLAlchemy(app)
+    # DATABASE_URL (e.g. sqlite:////data/film.db on a single node) overrides DB_*
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD)
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Optional read replicas, used by GET requests (see routing.py)
+    app.config["SQLALCHEMY_BINDS"] = replica_binds()
+    app.config.update(config or {})
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+
+    db.init_app(app)
+    with app.app_context():
+        # WAL, mmap and busy timeout pragmas for SQLite (see database.py)
+        for engine in db.engines.values():
+            tune_sqlite(engine)
+    init_routing(app)
+    # gzip / brotli / zstd depending on Accept-Encoding (see compression.py)
+    init_compression(app)
+
+    app.register_blueprint(api)
+    # CORS preflights are answered before Flask dispatch (see edge.py)
+    init_edge(app)
+    return app
 
 # --------------------------------------------------
 # CORS Configuration
 # --------------------------------------------------
-@app.after_request
+@api.after_app_request
 def add_cors_headers(response):
     """Add CORS headers to all responses"""
     response.headers['Access-Control-Allow-Origin'] = '*'
@@ -37,11 +65,11 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
     return response
 
-@app.route("/", methods=["OPTIONS"])
-@app.route("/<path:path>", methods=["OPTIONS"])
+@api.route("/", methods=["OPTIONS"])
+@api.route("/<path:path>", methods=["OPTIONS"])
 def options_handler(path=None):
-    """Handle preflight CORS requests"""
-    return '', 200
+    """Handle preflight CORS requests, only reached with EDGE_ENABLED=0"""
+    return '', 200, {'Access-Control-Max-Age': str(CORS_MAX_AGE)}
 
 # --------------------------------------------------
 # Modèles ORM
@@ -152,13 +180,13 @@ class Mark(db.Model):
 # --------------------------------------------------
 # Routes - Utilisateurs
 # --------------------------------------------------
-@app.route("/users", methods=["GET"])
+@api.route("/users", methods=["GET"])
 def get_users():
     users = Utilisateur.query.all()
     return jsonify([u.to_dict() for u in users])
 
 
-@app.route("/users", methods=["POST"])
+@api.route("/users", methods=["POST"])
 def create_user():
     data = request.get_json()
 
@@ -181,7 +209,7 @@ def create_user():
     return jsonify({"message": "Utilisateur ajouté", "user": user.to_dict()}), 201
 
 
-@app.route("/users/<int:user_id>", methods=["GET"])
+@api.route("/users/<int:user_id>", methods=["GET"])
 def get_user(user_id):
     user = Utilisateur.query.get(user_id)
 
@@ -191,7 +219,7 @@ def get_user(user_id):
     return jsonify(user.to_dict())
 
 
-@app.route("/users/<int:user_id>", methods=["DELETE"])
+@api.route("/users/<int:user_id>", methods=["DELETE"])
 def delete_user(user_id):
     user = Utilisateur.query.get(user_id)
 
@@ -207,7 +235,7 @@ def delete_user(user_id):
 # --------------------------------------------------
 # Routes - UserProfile
 # --------------------------------------------------
-@app.route("/users/<int:user_id>/profile", methods=["GET"])
+@api.route("/users/<int:user_id>/profile", methods=["GET"])
 def get_user_profile(user_id):
     profile = UserProfile.query.filter_by(user_id=user_id).first()
 
@@ -217,7 +245,7 @@ def get_user_profile(user_id):
     return jsonify(profile.to_dict())
 
 
-@app.route("/users/<int:user_id>/profile", methods=["POST"])
+@api.route("/users/<int:user_id>/profile", methods=["POST"])
 def create_user_profile(user_id):
     user = Utilisateur.query.get(user_id)
 
@@ -242,7 +270,7 @@ def create_user_profile(user_id):
     return jsonify({"message": "Profil créé", "profile": profile.to_dict()}), 201
 
 
-@app.route("/users/<int:user_id>/profile", methods=["PUT"])
+@api.route("/users/<int:user_id>/profile", methods=["PUT"])
 def update_user_profile(user_id):
     profile = UserProfile.query.filter_by(user_id=user_id).first()
 
@@ -261,13 +289,13 @@ def update_user_profile(user_id):
 # --------------------------------------------------
 # Routes - Directors
 # --------------------------------------------------
-@app.route("/directors", methods=["GET"])
+@api.route("/directors", methods=["GET"])
 def get_directors():
     directors = Director.query.all()
     return jsonify([d.to_dict() for d in directors])
 
 
-@app.route("/directors", methods=["POST"])
+@api.route("/directors", methods=["POST"])
 def create_director():
     data = request.get_json()
 
@@ -285,7 +313,7 @@ def create_director():
     return jsonify({"message": "Réalisateur ajouté", "director": director.to_dict()}), 201
 
 
-@app.route("/directors/<int:director_id>", methods=["DELETE"])
+@api.route("/directors/<int:director_id>", methods=["DELETE"])
 def delete_director(director_id):
     director = Director.query.get(director_id)
 
@@ -301,13 +329,13 @@ def delete_director(director_id):
 # --------------------------------------------------
 # Routes - Films
 # --------------------------------------------------
-@app.route("/films", methods=["GET"])
+@api.route("/films", methods=["GET"])
 def get_films():
     films = Film.query.all()
     return jsonify([f.to_dict() for f in films])
 
 
-@app.route("/films", methods=["POST"])
+@api.route("/films", methods=["POST"])
 def create_film():
     data = request.get_json()
 
@@ -332,7 +360,7 @@ def create_film():
     return jsonify({"message": "Film ajouté", "film": film.to_dict()}), 201
 
 
-@app.route("/films/<int:film_id>", methods=["GET"])
+@api.route("/films/<int:film_id>", methods=["GET"])
 def get_film(film_id):
     film = Film.query.get(film_id)
 
@@ -342,7 +370,7 @@ def get_film(film_id):
     return jsonify(film.to_dict())
 
 
-@app.route("/films/<int:film_id>", methods=["DELETE"])
+@api.route("/films/<int:film_id>", methods=["DELETE"])
 def delete_film(film_id):
     film = Film.query.get(film_id)
 
@@ -358,13 +386,13 @@ def delete_film(film_id):
 # --------------------------------------------------
 # Routes - Marks (Notes)
 # --------------------------------------------------
-@app.route("/marks", methods=["GET"])
+@api.route("/marks", methods=["GET"])
 def get_marks():
     marks = Mark.query.all()
     return jsonify([m.to_dict() for m in marks])
 
 
-@app.route("/marks", methods=["POST"])
+@api.route("/marks", methods=["POST"])
 def create_mark():
     data = request.get_json()
 
@@ -403,7 +431,7 @@ def create_mark():
     return jsonify({"message": "Note ajoutée", "mark": mark.to_dict()}), 201
 
 
-@app.route("/marks/<int:mark_id>", methods=["DELETE"])
+@api.route("/marks/<int:mark_id>", methods=["DELETE"])
 def delete_mark(mark_id):
     mark = Mark.query.get(mark_id)
 
@@ -416,7 +444,7 @@ def delete_mark(mark_id):
     return jsonify({"message": "Note supprimée"}), 200
 
 
-@app.route("/films/<int:film_id>/marks", methods=["GET"])
+@api.route("/films/<int:film_id>/marks", methods=["GET"])
 def get_film_marks(film_id):
     film = Film.query.get(film_id)
 
@@ -434,98 +462,97 @@ def get_film_marks(film_id):
 
 def seed_initial_data():
     """Ajoute des données initiales à la base de données"""
-    with app.app_context():
-        # Check if data already exists
-        if Utilisateur.query.first() is not None:
-            print("⚠️ Les données initiales existent déjà, abandon du seeding")
-            return
-
-        try:
-            # Create directors
-            director1 = Director(name="Christopher", surname="Nolan")
-            director2 = Director(name="Lana", surname="Wachowski")
-            director3 = Director(name="Denis", surname="Villeneuve")
-            
-            db.session.add_all([director1, director2, director3])
-            db.session.flush()  # Get the IDs
-            
-            # Create users
-            user1 = Utilisateur(username="alice", mail="alice@example.com", langue="français")
-            user2 = Utilisateur(username="bob", mail="bob@example.com", langue="anglais")
-            user3 = Utilisateur(username="charlie", mail="charlie@example.com", langue="espagnol")
-            
-            db.session.add_all([user1, user2, user3])
-            db.session.flush()  # Get the IDs
-            
-            # Create user profiles
-            profile1 = UserProfile(
-                user_id=user1.id,
-                bio="Passionnée par les films de science-fiction",
-                avatar_url="https://example.com/avatar1.jpg"
-            )
-            profile2 = UserProfile(
-                user_id=user2.id,
-                bio="Amoureux des classiques du cinéma",
-                avatar_url="https://example.com/avatar2.jpg"
-            )
-            profile3 = UserProfile(
-                user_id=user3.id,
-                bio="Critique de films aventure",
-                avatar_url="https://example.com/avatar3.jpg"
-            )
-            
-            db.session.add_all([profile1, profile2, profile3])
-            db.session.flush()
-            
-            # Create films
-            film1 = Film(
-                titre="Inception",
-                annee=2010,
-                duree=148,
-                id_director=director1.id
-            )
-            film2 = Film(
-                titre="The Matrix",
-                annee=1999,
-                duree=136,
-                id_director=director2.id
-            )
-            film3 = Film(
-                titre="Interstellar",
-                annee=2014,
-                duree=169,
-                id_director=director3.id
-            )
-            
-            db.session.add_all([film1, film2, film3])
-            db.session.flush()  # Get the IDs
-            
-            # Create marks (ratings)
-            mark1 = Mark(id_film=film1.id, id_user=user1.id, mark=9)
-            mark2 = Mark(id_film=film2.id, id_user=user1.id, mark=8)
-            mark3 = Mark(id_film=film1.id, id_user=user2.id, mark=10)
-            mark4 = Mark(id_film=film3.id, id_user=user2.id, mark=7)
-            mark5 = Mark(id_film=film2.id, id_user=user3.id, mark=6)
-            mark6 = Mark(id_film=film3.id, id_user=user1.id, mark=9)
-            
-            db.session.add_all([mark1, mark2, mark3, mark4, mark5, mark6])
-            
-            # Commit all changes
-            db.session.commit()
-            
-            print("✅ Données initiales ajoutées avec succès")
-            print(f"   - 3 réalisateurs créés")
-            print(f"   - 3 utilisateurs créés")
-            print(f"   - 3 profils utilisateur créés")
-            print(f"   - 3 films créés")
-            print(f"   - 6 notes créées")
-            
-        except Exception as e:
-            db.session.rollback()
-            print(f"❌ Erreur lors de l'ajout des données initiales: {str(e)}")
-
-
-def init_db():
+    # Check if data already exists
+    if Utilisateur.query.first() is not None:
+        print("⚠️ Les données initiales existent déjà, abandon du seeding")
+        return
+
+    try:
+        # Create directors
+        director1 = Director(name="Christopher", surname="Nolan")
+        director2 = Director(name="Lana", surname="Wachowski")
+        director3 = Director(name="Denis", surname="Villeneuve")
+        
+        db.session.add_all([director1, director2, director3])
+        db.session.flush()  # Get the IDs
+        
+        # Create users
+        user1 = Utilisateur(username="alice", mail="alice@example.com", langue="français")
+        user2 = Utilisateur(username="bob", mail="bob@example.com", langue="anglais")
+        user3 = Utilisateur(username="charlie", mail="charlie@example.com", langue="espagnol")
+        
+        db.session.add_all([user1, user2, user3])
+        db.session.flush()  # Get the IDs
+        
+        # Create user profiles
+        profile1 = UserProfile(
+            user_id=user1.id,
+            bio="Passionnée par les films de science-fiction",
+            avatar_url="https://example.com/avatar1.jpg"
+        )
+        profile2 = UserProfile(
+            user_id=user2.id,
+            bio="Amoureux des classiques du cinéma",
+            avatar_url="https://example.com/avatar2.jpg"
+        )
+        profile3 = UserProfile(
+            user_id=user3.id,
+            bio="Critique de films aventure",
+            avatar_url="https://example.com/avatar3.jpg"
+        )
+        
+        db.session.add_all([profile1, profile2, profile3])
+        db.session.flush()
+        
+        # Create films
+        film1 = Film(
+            titre="Inception",
+            annee=2010,
+            duree=148,
+            id_director=director1.id
+        )
+        film2 = Film(
+            titre="The Matrix",
+            annee=1999,
+            duree=136,
+            id_director=director2.id
+        )
+        film3 = Film(
+            titre="Interstellar",
+            annee=2014,
+            duree=169,
+            id_director=director3.id
+        )
+        
+        db.session.add_all([film1, film2, film3])
+        db.session.flush()  # Get the IDs
+        
+        # Create marks (ratings)
+        mark1 = Mark(id_film=film1.id, id_user=user1.id, mark=9)
+        mark2 = Mark(id_film=film2.id, id_user=user1.id, mark=8)
+        mark3 = Mark(id_film=film1.id, id_user=user2.id, mark=10)
+        mark4 = Mark(id_film=film3.id, id_user=user2.id, mark=7)
+        mark5 = Mark(id_film=film2.id, id_user=user3.id, mark=6)
+        mark6 = Mark(id_film=film3.id, id_user=user1.id, mark=9)
+        
+        db.session.add_all([mark1, mark2, mark3, mark4, mark5, mark6])
+        
+        # Commit all changes
+        db.session.commit()
+        
+        print("✅ Données initiales ajoutées avec succès")
+        print(f"   - 3 réalisateurs créés")
+        print(f"   - 3 utilisateurs créés")
+        print(f"   - 3 profils utilisateur créés")
+        print(f"   - 3 films créés")
+        print(f"   - 6 notes créées")
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Erreur lors de l'ajout des données initiales: {str(e)}")
+
+
+def init_db(app):
     with app.app_context():
         db.create_all()
         seed_initial_data()
@@ -534,7 +561,7 @@ def init_db():
 # Lancement
 # --------------------------------------------------
 if __name__ == "__main__":
-    init_db()
-    seed_initial_data()
+    app = create_app()
+    init_db(app)
     print("🚀 API Flask lancée sur http://127.0.0.1:5000")
     app.run(debug=True)
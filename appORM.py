@@ -1,12 +1,38 @@
 import os
 import json
 import secrets
-from flask import Flask, jsonify, request
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
 import bcrypt
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import joinedload
+
+import analytics
+import changes
+from compression import init_compression
+from database import database_url, engine_options, tune_sqlite
+import deadlines
+import directorstats
+from edge import MAX_AGE as CORS_MAX_AGE, USER_KEY, init_edge
+from entitycache import EntityCache, install_triggers
+import hotqueries
+import ingest
+from migrations import upgrade_mark_table
+from partitions import ensure_mark_partitions, not_postgres
+from ratelimit import limiter_from_env
+from routing import READ_METHODS, RoutingSession, init_routing, may_read_stale, replica_binds
+import search
+from sessions import sessions_from_env
+import snapshot
+from snapshot import CatalogueSnapshot
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,8 +40,6 @@ load_dotenv()
 # --------------------------------------------------
 # Configuration Flask & Base de données
 # --------------------------------------------------
-app = Flask(__name__)
-
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "film_db")
@@ -23,38 +47,54 @@ DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 API_SECRET_KEY = os.getenv("API_SECRET_KEY", secrets.token_hex(16))
 
-app.secret_key = API_SECRET_KEY
+# Extensions are bound to an application in create_app()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+api = Blueprint("api", __name__)
+
+# Login tokens, shared by all workers (see sessions.py)
+SESSIONS = sessions_from_env()
+# Paths reached without a token, also let through by the WSGI layer (see edge.py)
+PUBLIC_PATHS = {"/login", "/logout"}
+
+# Per-route token buckets, shared by all workers (see ratelimit.py)
+LIMITER = limiter_from_env()
 
-# Database configuration
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Directors, films, users and profiles by id, invalidated by LISTEN/NOTIFY (see entitycache.py)
+ENTITY_CACHE = EntityCache()
+ENTITY_CACHE.watch_sessions(RoutingSession)
 
-# Initialize extensions
-db = SQLAlchemy(app)
-CORS(app)
+# Films and directors mapped read-only from the file worker.py rebuilds (see snapshot.py)
+CATALOGUE = CatalogueSnapshot()
 
-# Load users from JSON file for authentication
-try:
-    with open("users.json") as f:
-        USERS = json.load(f)
-except FileNotFoundError:
-    USERS = {}
-    print("⚠️ Warning: users.json not found. Please create it with user credentials.")
+# Ratings as NumPy columns mapped from the file worker.py rebuilds (see analytics.py)
+RATINGS = analytics.RatingsDataset()
 
-# Session storage
-SESSIONS = {}
+# Each transaction of a request gets SET LOCAL statement_timeout (see deadlines.py)
+deadlines.watch_sessions(RoutingSession)
 
 
 # --------------------------------------------------
 # Authentication Functions
 # --------------------------------------------------
+def load_users(path):
+    """Load users from JSON file for authentication"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Warning: {path} not found. Please create it with user credentials.")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Warning: {path} is not valid JSON ({e}), nobody can log in.")
+        return {}
+
+
 def validate_credentials(username, password):
     """Validate username and password against stored hashed password"""
-    if username not in USERS:
+    users = current_app.config["USERS"]
+    if username not in users:
         return False
-    hashed = USERS[username]
+    hashed = users[username]
     try:
         return bcrypt.checkpw(password.encode(), hashed.encode())
     except Exception:
@@ -69,14 +109,18 @@ def get_user_from_token(token):
 # --------------------------------------------------
 # Middleware - Token Validation
 # --------------------------------------------------
-@app.before_request
+@api.before_app_request
 def check_token():
     """Validate token for protected routes"""
-    public_endpoints = {"login", "logout"}
+    public_endpoints = {"api.login", "api.logout"}
     
-    # Allow public endpoints
-    if request.endpoint in public_endpoints or request.method == "OPTIONS":
+    # Allow preflight requests
+    if request.method == "OPTIONS":
         return
+
+    # Public endpoints are rate limited by client IP
+    if request.endpoint in public_endpoints:
+        return rate_limit(request.endpoint, request.remote_addr)
     
     # Check for Authorization header
     auth = request.headers.get("Authorization")
@@ -89,9 +133,27 @@ def check_token():
     except IndexError:
         return jsonify({"status": "unauthorized", "message": "Invalid token format"}), 401
     
-    if token not in SESSIONS:
+    # edge.py already looked the token up when it let the request through
+    if USER_KEY not in request.environ and token not in SESSIONS:
         return jsonify({"status": "unauthorized", "message": "Invalid or expired token"}), 401
 
+    return rate_limit(request.endpoint, token)
+
+
+def rate_limit(endpoint, client_key):
+    """Consume one request from the client's bucket, answer 429 when it is empty"""
+    if LIMITER is None:
+        return
+
+    # Quotas are configured by view name, without the blueprint prefix
+    view = (endpoint or "default").rpartition(".")[2]
+    allowed, retry_after = LIMITER.consume(view, client_key)
+    if not allowed:
+        response = jsonify({"status": "error", "message": "Too many requests"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
 
 # --------------------------------------------------
 # Modèles ORM
@@ -168,6 +230,9 @@ class Film(db.Model):
     # Relations
     marks = db.relationship("Mark", backref="film", cascade="all, delete-orphan")
 
+    # Filmography pages of GET /directors/<id>
+    __table_args__ = (db.Index("ix_film_director_annee", "id_director", "annee", "id"),)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -182,13 +247,25 @@ class Film(db.Model):
 class Mark(db.Model):
     __tablename__ = "mark"
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer)
     id_film = db.Column(db.Integer, db.ForeignKey("film.id"), nullable=False)
     id_user = db.Column(db.Integer, db.ForeignKey("utilisateurs.id"), nullable=False)
     mark = db.Column(db.Integer, nullable=False)  # 0-10
-
-    # Unique constraint: one mark per user per film
-    __table_args__ = (db.UniqueConstraint("id_film", "id_user", name="unique_user_film_mark"),)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # On Postgres the table is range-partitioned by month of created_at (see
+    # partitions.py). A unique key there has to include created_at, so the
+    # primary key and the one-mark-per-user-per-film constraint only exist on
+    # other backends; Postgres gets plain indexes and lock_mark_pair().
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id").ddl_if(callable_=not_postgres),
+        db.UniqueConstraint("id_film", "id_user", name="unique_user_film_mark").ddl_if(callable_=not_postgres),
+        db.Index("ix_mark_id", "id").ddl_if(dialect="postgresql"),
+        db.Index("ix_mark_film_user", "id_film", "id_user").ddl_if(dialect="postgresql"),
+        db.Index("ix_mark_created_at", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     def to_dict(self):
         return {
@@ -196,13 +273,167 @@ class Mark(db.Model):
             "id_film": self.id_film,
             "id_user": self.id_user,
             "mark": self.mark,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
+def lock_mark_pair(id_film, id_user):
+    """Serialize writers of one (film, user) pair until the end of the transaction"""
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(sa.text("SELECT pg_advisory_xact_lock(:f, :u)"), {"f": id_film, "u": id_user})
+
+
+class Job(db.Model):
+    __tablename__ = "job"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    # Earliest start for pending jobs, lease expiry for running ones
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.Index("ix_job_status_run_after", "status", "run_after"),)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "payload": self.payload,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class Change(db.Model):
+    __tablename__ = "change_log"
+
+    # BIGINT on Postgres, INTEGER on SQLite where only it autoincrements
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    # Writing transaction on Postgres, see changes.py
+    txid = db.Column(db.BigInteger)
+    entity = db.Column(db.String(20), nullable=False)  # film, director, mark
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # upsert, delete
+    data = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_change_log_txid_seq", "txid", "seq"),
+        db.Index("ix_change_log_created_at", "created_at"),
+    )
+
+
+# Every flush of a film, director or mark also writes its change (see changes.py)
+changes.watch_sessions(RoutingSession, Change.__table__, {Film: "film", Director: "director", Mark: "mark", Utilisateur: "user"})
+
+
+def enqueue_job(kind, payload=None, unique=False):
+    """Add a job for worker.py; with unique=True reuse a job of the same kind still waiting"""
+    if unique:
+        job = Job.query.filter_by(kind=kind, status="pending").first()
+        if job:
+            return job
+
+    job = Job(kind=kind, payload=payload)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+# Write-behind ingestion of marks, opt-in with MARKS_INGEST_MODE=group (see ingest.py)
+INGESTOR = ingest.MarkIngestor(db, Mark.__table__, Change.__table__) if ingest.MODE == "group" else None
+
+
+# --------------------------------------------------
+# Cached lookups
+# --------------------------------------------------
+def find_director(director_id):
+    return ENTITY_CACHE.get_or_load(
+        db.engine, "director", director_id, lambda: hotqueries.find_director(db.session, director_id)
+    )
+
+
+def find_film(film_id):
+    return ENTITY_CACHE.get_or_load(
+        db.engine, "film", film_id, lambda: hotqueries.find_film(db.session, film_id)
+    )
+
+
+def find_user(user_id):
+    return ENTITY_CACHE.get_or_load(
+        db.engine, "utilisateurs", user_id, lambda: hotqueries.find_user(db.session, user_id)
+    )
+
+
+def find_profile(user_id):
+    return ENTITY_CACHE.get_or_load(
+        db.engine, "user_profile", user_id, lambda: hotqueries.find_profile(db.session, user_id)
+    )
+
+
+def as_id(value):
+    """Integer id from a JSON value, "12" included; ValueError otherwise"""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"invalid id {value!r}")
+    return int(value)
+
+
+# --------------------------------------------------
+# Multi-get by id list
+# --------------------------------------------------
+MAX_IDS = 100
+
+
+def parse_ids(raw):
+    """Parse "1,2,3" into a list of distinct ints in request order (None if invalid)"""
+    try:
+        ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        return None
+    ids = list(dict.fromkeys(ids))
+    if not ids or len(ids) > MAX_IDS:
+        return None
+    return ids
+
+
+def id_filter(column, ids):
+    """WHERE id = ANY(:ids) on Postgres: one array parameter, so one statement whatever the count"""
+    if db.engine.dialect.name == "postgresql":
+        return column == sa.any_(sa.bindparam("ids", ids, type_=ARRAY(sa.Integer)))
+    return column.in_(ids)
+
+
+def get_many(model, raw_ids, *options):
+    """Fetch several rows in one query, keep the requested order and report missing ids"""
+    ids = parse_ids(raw_ids)
+    if ids is None:
+        return jsonify({"error": f"ids doit être une liste de 1 à {MAX_IDS} entiers"}), 400
+
+    rows = model.query.options(*options).filter(id_filter(model.id, ids)).all()
+    by_id = {row.id: row for row in rows}
+
+    return jsonify({
+        "items": [by_id[i].to_dict() for i in ids if i in by_id],
+        "missing": [i for i in ids if i not in by_id],
+    })
+
+
 # --------------------------------------------------
 # Routes - Authentication
 # --------------------------------------------------
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
 def login():
     """Login endpoint - returns bearer token on success"""
     data = request.get_json()
@@ -228,7 +459,7 @@ def login():
         }), 401
 
 
-@app.route("/logout", methods=["POST"])
+@api.route("/logout", methods=["POST"])
 def logout():
     """Logout endpoint - removes token from active sessions"""
     auth = request.headers.get("Authorization")
@@ -236,8 +467,7 @@ def logout():
         return jsonify({"status": "error", "message": "Invalid token"}), 401
     
     token = auth.split()[1]
-    if token in SESSIONS:
-        SESSIONS.pop(token)
+    SESSIONS.pop(token, None)
     
     return jsonify({"status": "success", "message": "Successfully logged out"}), 200
 
@@ -245,13 +475,16 @@ def logout():
 # --------------------------------------------------
 # Routes - Utilisateurs
 # --------------------------------------------------
-@app.route("/users", methods=["GET"])
+@api.route("/users", methods=["GET"])
 def get_users():
+    if "ids" in request.args:
+        return get_many(Utilisateur, request.args["ids"])
+
     users = Utilisateur.query.all()
     return jsonify([u.to_dict() for u in users])
 
 
-@app.route("/users", methods=["POST"])
+@api.route("/users", methods=["POST"])
 def create_user():
     data = request.get_json()
 
@@ -274,17 +507,17 @@ def create_user():
     return jsonify({"message": "Utilisateur ajouté", "user": user.to_dict()}), 201
 
 
-@app.route("/users/<int:user_id>", methods=["GET"])
+@api.route("/users/<int:user_id>", methods=["GET"])
 def get_user(user_id):
-    user = Utilisateur.query.get(user_id)
+    user = find_user(user_id)
 
     if not user:
         return jsonify({"error": "Utilisateur introuvable"}), 404
 
-    return jsonify(user.to_dict())
+    return jsonify(user)
 
 
-@app.route("/users/<int:user_id>", methods=["DELETE"])
+@api.route("/users/<int:user_id>", methods=["DELETE"])
 def delete_user(user_id):
     user = Utilisateur.query.get(user_id)
 
@@ -300,25 +533,22 @@ def delete_user(user_id):
 # --------------------------------------------------
 # Routes - UserProfile
 # --------------------------------------------------
-@app.route("/users/<int:user_id>/profile", methods=["GET"])
+@api.route("/users/<int:user_id>/profile", methods=["GET"])
 def get_user_profile(user_id):
-    profile = UserProfile.query.filter_by(user_id=user_id).first()
+    profile = find_profile(user_id)
 
     if not profile:
         return jsonify({"error": "Profil utilisateur introuvable"}), 404
 
-    return jsonify(profile.to_dict())
+    return jsonify(profile)
 
 
-@app.route("/users/<int:user_id>/profile", methods=["POST"])
+@api.route("/users/<int:user_id>/profile", methods=["POST"])
 def create_user_profile(user_id):
-    user = Utilisateur.query.get(user_id)
-
-    if not user:
+    if not find_user(user_id):
         return jsonify({"error": "Utilisateur introuvable"}), 404
 
-    existing_profile = UserProfile.query.filter_by(user_id=user_id).first()
-    if existing_profile:
+    if find_profile(user_id):
         return jsonify({"error": "Ce utilisateur a déjà un profil"}), 400
 
     data = request.get_json()
@@ -335,7 +565,7 @@ def create_user_profile(user_id):
     return jsonify({"message": "Profil créé", "profile": profile.to_dict()}), 201
 
 
-@app.route("/users/<int:user_id>/profile", methods=["PUT"])
+@api.route("/users/<int:user_id>/profile", methods=["PUT"])
 def update_user_profile(user_id):
     profile = UserProfile.query.filter_by(user_id=user_id).first()
 
@@ -354,13 +584,18 @@ def update_user_profile(user_id):
 # --------------------------------------------------
 # Routes - Directors
 # --------------------------------------------------
-@app.route("/directors", methods=["GET"])
+@api.route("/directors", methods=["GET"])
 def get_directors():
-    directors = Director.query.all()
-    return jsonify([d.to_dict() for d in directors])
+    if "ids" in request.args:
+        return get_many(Director, request.args["ids"])
 
+    directors = CATALOGUE.directors() if snapshot.ENABLED and may_read_stale() else None
+    if directors is None:
+        directors = [d.to_dict() for d in Director.query.all()]
+    return jsonify(directors)
 
-@app.route("/directors", methods=["POST"])
+
+@api.route("/directors", methods=["POST"])
 def create_director():
     data = request.get_json()
 
@@ -378,7 +613,47 @@ def create_director():
     return jsonify({"message": "Réalisateur ajouté", "director": director.to_dict()}), 201
 
 
-@app.route("/directors/<int:director_id>", methods=["DELETE"])
+FILMOGRAPHY_DEFAULT_LIMIT = 50
+FILMOGRAPHY_MAX_LIMIT = 200
+
+
+@api.route("/directors/<int:director_id>", methods=["GET"])
+def get_director(director_id):
+    """Director, rating stats and one page of the filmography (by year, then id)"""
+    director = find_director(director_id)
+    if not director:
+        return jsonify({"error": "Réalisateur introuvable"}), 404
+
+    try:
+        limit = int(request.args.get("limit", FILMOGRAPHY_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= FILMOGRAPHY_MAX_LIMIT:
+        return jsonify({"error": f"limit doit être entre 1 et {FILMOGRAPHY_MAX_LIMIT}"}), 400
+
+    # Keyset pagination on ix_film_director_annee: the page costs the same at any depth
+    query = Film.query.filter(Film.id_director == director_id)
+    if request.args.get("cursor"):
+        try:
+            annee, film_id = (int(part) for part in request.args["cursor"].split(":"))
+        except ValueError:
+            return jsonify({"error": "cursor invalide"}), 400
+        query = query.filter(sa.tuple_(Film.annee, Film.id) > sa.tuple_(annee, film_id))
+    films = query.order_by(Film.annee, Film.id).limit(limit).all()
+
+    next_cursor = f"{films[-1].annee}:{films[-1].id}" if len(films) == limit else None
+    return jsonify({
+        **director,
+        "stats": directorstats.director_stats(db.session, director_id),
+        "films": [
+            {"id": f.id, "titre": f.titre, "annee": f.annee, "duree": f.duree}
+            for f in films
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@api.route("/directors/<int:director_id>", methods=["DELETE"])
 def delete_director(director_id):
     director = Director.query.get(director_id)
 
@@ -394,29 +669,36 @@ def delete_director(director_id):
 # --------------------------------------------------
 # Routes - Films
 # --------------------------------------------------
-@app.route("/films", methods=["GET"])
+@api.route("/films", methods=["GET"])
 def get_films():
-    films = Film.query.all()
+    if "ids" in request.args:
+        return get_many(Film, request.args["ids"], joinedload(Film.director))
+
+    films = Film.query.options(joinedload(Film.director)).all()
     return jsonify([f.to_dict() for f in films])
 
 
-@app.route("/films", methods=["POST"])
+@api.route("/films", methods=["POST"])
 def create_film():
     data = request.get_json()
 
     if not data.get("titre") or not data.get("annee") or not data.get("duree"):
         return jsonify({"error": "titre, annee et duree obligatoires"}), 400
 
+    id_director = None
     if data.get("id_director"):
-        director = Director.query.get(data["id_director"])
-        if not director:
+        try:
+            id_director = as_id(data["id_director"])
+        except ValueError:
+            return jsonify({"error": "id_director doit être un entier"}), 400
+        if not find_director(id_director):
             return jsonify({"error": "Réalisateur introuvable"}), 404
 
     film = Film(
         titre=data["titre"],
         annee=data["annee"],
         duree=data["duree"],
-        id_director=data.get("id_director"),
+        id_director=id_director,
     )
 
     db.session.add(film)
@@ -425,17 +707,18 @@ def create_film():
     return jsonify({"message": "Film ajouté", "film": film.to_dict()}), 201
 
 
-@app.route("/films/<int:film_id>", methods=["GET"])
+@api.route("/films/<int:film_id>", methods=["GET"])
 def get_film(film_id):
-    film = Film.query.get(film_id)
+    # A film missing from the snapshot may be newer than it: ask the database
+    film = (CATALOGUE.film(film_id) if snapshot.ENABLED and may_read_stale() else None) or find_film(film_id)
 
     if not film:
         return jsonify({"error": "Film introuvable"}), 404
 
-    return jsonify(film.to_dict())
+    return jsonify(film)
 
 
-@app.route("/films/<int:film_id>", methods=["DELETE"])
+@api.route("/films/<int:film_id>", methods=["DELETE"])
 def delete_film(film_id):
     film = Film.query.get(film_id)
 
@@ -451,13 +734,31 @@ def delete_film(film_id):
 # --------------------------------------------------
 # Routes - Marks (Notes)
 # --------------------------------------------------
-@app.route("/marks", methods=["GET"])
+def parse_utc(value):
+    """ISO 8601 date or datetime as the naive UTC datetimes stored in the tables"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+@api.route("/marks", methods=["GET"])
 def get_marks():
-    marks = Mark.query.all()
+    """All marks, or those created in [since, until) when a window is given"""
+    query = Mark.query
+    try:
+        if request.args.get("since"):
+            query = query.filter(Mark.created_at >= parse_utc(request.args["since"]))
+        if request.args.get("until"):
+            query = query.filter(Mark.created_at < parse_utc(request.args["until"]))
+    except ValueError:
+        return jsonify({"error": "since et until doivent être des dates ISO 8601"}), 400
+
+    marks = query.order_by(Mark.created_at).all()
     return jsonify([m.to_dict() for m in marks])
 
 
-@app.route("/marks", methods=["POST"])
+@api.route("/marks", methods=["POST"])
 def create_mark():
     data = request.get_json()
 
@@ -467,16 +768,30 @@ def create_mark():
     if not (0 <= data["mark"] <= 10):
         return jsonify({"error": "mark doit être entre 0 et 10"}), 400
 
-    film = Film.query.get(data["id_film"])
-    user = Utilisateur.query.get(data["id_user"])
+    try:
+        id_film, id_user = as_id(data["id_film"]), as_id(data["id_user"])
+    except ValueError:
+        return jsonify({"error": "id_film et id_user doivent être des entiers"}), 400
 
-    if not film:
+    if not find_film(id_film):
         return jsonify({"error": "Film introuvable"}), 404
-    if not user:
+    if not find_user(id_user):
         return jsonify({"error": "Utilisateur introuvable"}), 404
 
+    if INGESTOR is not None:
+        if not INGESTOR.submit(current_app._get_current_object(), id_film, id_user, data["mark"]):
+            response = jsonify({"error": "File d'ingestion pleine, réessayez plus tard"})
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+            return response
+        return jsonify({
+            "message": "Note acceptée",
+            "mark": {"id_film": id_film, "id_user": id_user, "mark": data["mark"]},
+        }), 202
+
+    lock_mark_pair(id_film, id_user)
     existing_mark = Mark.query.filter_by(
-        id_film=data["id_film"], id_user=data["id_user"]
+        id_film=id_film, id_user=id_user
     ).first()
 
     if existing_mark:
@@ -485,8 +800,8 @@ def create_mark():
         return jsonify({"message": "Note mise à jour", "mark": existing_mark.to_dict()}), 200
 
     mark = Mark(
-        id_film=data["id_film"],
-        id_user=data["id_user"],
+        id_film=id_film,
+        id_user=id_user,
         mark=data["mark"],
     )
 
@@ -496,7 +811,15 @@ def create_mark():
     return jsonify({"message": "Note ajoutée", "mark": mark.to_dict()}), 201
 
 
-@app.route("/marks/<int:mark_id>", methods=["DELETE"])
+@api.route("/marks/ingest", methods=["GET"])
+def get_marks_ingest_stats():
+    """Queue depth and flush lag of this worker's write-behind ingestion"""
+    if INGESTOR is None:
+        return jsonify({"mode": ingest.MODE})
+    return jsonify(INGESTOR.stats())
+
+
+@api.route("/marks/<int:mark_id>", methods=["DELETE"])
 def delete_mark(mark_id):
     mark = Mark.query.get(mark_id)
 
@@ -509,125 +832,523 @@ def delete_mark(mark_id):
     return jsonify({"message": "Note supprimée"}), 200
 
 
-@app.route("/films/<int:film_id>/marks", methods=["GET"])
+@api.route("/films/<int:film_id>/marks", methods=["GET"])
 def get_film_marks(film_id):
-    film = Film.query.get(film_id)
-
-    if not film:
+    if not find_film(film_id):
         return jsonify({"error": "Film introuvable"}), 404
 
     marks = Mark.query.filter_by(id_film=film_id).all()
     return jsonify([m.to_dict() for m in marks])
 
 
+# --------------------------------------------------
+# Routes - Search
+# --------------------------------------------------
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+SEARCH_TYPES = {"film": ["film"], "profile": ["profile"], "all": ["film", "profile"]}
+
+
+@api.route("/search", methods=["GET"])
+def search_all():
+    """Ranked full-text search over film titles and profile bios"""
+    terms = request.args.get("q", "").strip()
+    if not terms:
+        return jsonify({"error": "q obligatoire"}), 400
+
+    config = search.SEARCH_CONFIGS.get(request.args.get("lang", "simple").lower())
+    if config is None:
+        return jsonify({"error": f"lang doit être l'une de : {', '.join(search.SEARCH_CONFIGS)}"}), 400
+
+    kinds = SEARCH_TYPES.get(request.args.get("type", "all"))
+    if kinds is None:
+        return jsonify({"error": "type doit être film, profile ou all"}), 400
+
+    try:
+        limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return jsonify({"error": f"limit doit être entre 1 et {SEARCH_MAX_LIMIT}"}), 400
+
+    after = None
+    if request.args.get("cursor"):
+        try:
+            after = search.decode_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "cursor invalide"}), 400
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        hits = search.search_postgres(db.session, terms, config, kinds, limit, after)
+    else:
+        hits = search.search_like(db.session, terms, kinds, limit, after)
+
+    items = []
+    for hit in hits:
+        item = {"type": hit["type"], "rank": round(hit["rank"], 6), "headline": hit["headline"]}
+        if hit["type"] == "film":
+            item["film"] = find_film(hit["id"])
+        else:
+            item["profile"] = find_profile(hit["id"])
+        items.append(item)
+
+    next_cursor = None
+    if len(hits) == limit:
+        last = hits[-1]
+        next_cursor = search.encode_cursor(last["rank"], last["type"], last["id"])
+    return jsonify({"items": items, "next_cursor": next_cursor})
+
+
+# --------------------------------------------------
+# Routes - Analytics
+# --------------------------------------------------
+ANALYTICS_DEFAULT_LIMIT = 100
+ANALYTICS_MAX_LIMIT = 1000
+
+
+def int_arg(name, default=None):
+    """Integer query parameter, ValueError when it is not one"""
+    value = request.args.get(name)
+    return default if value in (None, "") else int(value)
+
+
+@api.route("/analytics", methods=["GET"])
+def get_analytics():
+    """Rating aggregates by decade, year, director, langue, film or user"""
+    ratings = RATINGS.current()
+    if ratings is None:
+        return jsonify({"error": "Statistiques indisponibles, réessayez plus tard"}), 503
+
+    group = request.args.get("group", "decade")
+    if group not in analytics.GROUPS:
+        return jsonify({"error": f"group doit être l'un de : {', '.join(analytics.GROUPS)}"}), 400
+    sort = request.args.get("sort", "key")
+    if sort not in analytics.SORTS:
+        return jsonify({"error": f"sort doit être l'un de : {', '.join(analytics.SORTS)}"}), 400
+
+    try:
+        filters = {
+            "director": int_arg("director"),
+            "langue": request.args.get("langue") or None,
+            "year_from": int_arg("year_from"),
+            "year_to": int_arg("year_to"),
+        }
+        min_votes = int_arg("min_votes", 1)
+        limit = int_arg("limit", ANALYTICS_DEFAULT_LIMIT)
+    except ValueError:
+        return jsonify({"error": "director, year_from, year_to, min_votes et limit doivent être des entiers"}), 400
+    if not 1 <= limit <= ANALYTICS_MAX_LIMIT:
+        return jsonify({"error": f"limit doit être entre 1 et {ANALYTICS_MAX_LIMIT}"}), 400
+
+    overall, total_groups, groups = analytics.aggregate(
+        ratings,
+        group,
+        analytics.select(ratings, **filters),
+        sort=sort,
+        min_votes=max(min_votes, 1),
+        limit=limit,
+        histogram=request.args.get("histogram") in ("1", "true"),
+    )
+    return jsonify({
+        "group": group,
+        "as_of": ratings.built_at.isoformat(),
+        "overall": overall,
+        "total_groups": total_groups,
+        "groups": groups,
+    })
+
+
+# --------------------------------------------------
+# Routes - Change Feed
+# --------------------------------------------------
+# User changes are recorded for worker.py only, the feed does not publish them
+FEED_ENTITIES = {"film", "director", "mark"}
+
+
+def parse_feed_args():
+    """(since, entities) from the query string, or a 400 response"""
+    try:
+        since = int(request.args.get("since") or request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        since = -1
+    if since < 0:
+        return None, None, (jsonify({"error": "since doit être un entier positif"}), 400)
+
+    entities = [e for e in request.args.get("entity", "").split(",") if e]
+    if not set(entities) <= FEED_ENTITIES:
+        return None, None, (jsonify({"error": "entity doit être film, director ou mark"}), 400)
+    return since, entities or sorted(FEED_ENTITIES), None
+
+
+def expired_feed():
+    return jsonify({"error": "Historique expiré, resynchronisez les collections"}), 410
+
+
+@api.route("/changes", methods=["GET"])
+def get_changes():
+    """Changes after the one numbered `since`, oldest first"""
+    since, entities, error = parse_feed_args()
+    if error:
+        return error
+    try:
+        limit = int(request.args.get("limit", changes.PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= changes.PAGE_SIZE:
+        return jsonify({"error": f"limit doit être entre 1 et {changes.PAGE_SIZE}"}), 400
+
+    try:
+        page, has_more = changes.read_changes(db.session, Change.__table__, since, limit, entities)
+    except changes.ExpiredPosition:
+        return expired_feed()
+
+    return jsonify({
+        "changes": page,
+        "next_since": page[-1]["seq"] if page else since,
+        "has_more": has_more,
+    })
+
+
+@api.route("/changes/stream", methods=["GET"])
+def stream_changes():
+    """Server-Sent Events: the backlog after `since` (or Last-Event-ID), then new changes"""
+    since, entities, error = parse_feed_args()
+    if error:
+        return error
+    try:
+        changes.read_changes(db.session, Change.__table__, since, 1, entities)
+    except changes.ExpiredPosition:
+        return expired_feed()
+    # The stream outlives any request budget; each poll is a short indexed query
+    g.pop("deadline", None)
+
+    def events(position):
+        yield f"retry: {changes.STREAM_RETRY_MS}\n\n"
+        idle = 0.0
+        # Ends the response so the worker is freed; EventSource reconnects
+        closes_at = time.monotonic() + changes.STREAM_MAX_SECONDS
+        while time.monotonic() < closes_at:
+            page, has_more = changes.read_changes(db.session, Change.__table__, position, changes.PAGE_SIZE, entities)
+            # Do not hold a snapshot while waiting
+            db.session.rollback()
+            for change in page:
+                yield changes.sse_event(change)
+                position = change["seq"]
+            if page:
+                idle = 0.0
+            if has_more:
+                continue
+            time.sleep(min(changes.STREAM_POLL_SECONDS, max(closes_at - time.monotonic(), 0)))
+            idle += changes.STREAM_POLL_SECONDS
+            if idle >= changes.STREAM_HEARTBEAT_SECONDS:
+                # Keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+                idle = 0.0
+
+    response = Response(stream_with_context(events(since)), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+# --------------------------------------------------
+# Routes - Batch
+# --------------------------------------------------
+MAX_BATCH_SIZE = 20
+BATCH_EXCLUDED_ENDPOINTS = {"api.login", "api.logout", "api.batch", "api.stream_changes"}
+
+
+def run_subrequest(sub, headers):
+    """Dispatch one sub-request through the normal routes, without the auth hook.
+
+    The request context is pushed inside the current application context, so
+    sequential sub-requests share the batch's database session and `g`. Only
+    the view runs: before/after_request hooks (token check, deadline,
+    compression, primary pinning) apply to the batch request as a whole.
+    """
+    app = current_app._get_current_object()
+    method = str(sub.get("method", "GET")).upper()
+    path = sub.get("path")
+    if not isinstance(path, str) or not path.startswith("/"):
+        return {"status": 400, "body": {"error": "path obligatoire"}}
+
+    environ = EnvironBuilder(path=path, method=method, json=sub.get("body"), headers=headers).get_environ()
+    with app.request_context(environ):
+        if request.endpoint in BATCH_EXCLUDED_ENDPOINTS:
+            return {"status": 400, "body": {"error": "Route non autorisée dans un batch"}}
+
+        # Every sub-request still counts against the client's quota
+        limited = rate_limit(request.endpoint, headers["Authorization"].split(" ")[1])
+        if limited is not None:
+            response = limited
+        else:
+            try:
+                response = app.make_response(app.dispatch_request())
+            except HTTPException as e:
+                response = app.make_response((jsonify({"error": e.name}), e.code))
+            except Exception as e:
+                db.session.rollback()
+                if deadlines.is_deadline_error(e):
+                    response = deadlines.timeout_response()
+                else:
+                    app.logger.exception(e)
+                    response = app.make_response((jsonify({"error": "Erreur interne"}), 500))
+
+        if method not in READ_METHODS and response.status_code < 400:
+            # The batch's response hook pins the client only after a write
+            g.wrote = True
+
+        body = response.get_json(silent=True)
+        if body is None:
+            body = response.get_data(as_text=True)
+        return {"status": response.status_code, "body": body}
+
+
+def run_subrequest_in_own_context(app, sub, headers, deadline):
+    # Parallel sub-requests each get an application context, hence a session
+    with app.app_context():
+        g.deadline = deadline
+        return run_subrequest(sub, headers)
+
+
+@api.route("/batch", methods=["POST"])
+def batch():
+    data = request.get_json()
+    subrequests = data.get("requests") if isinstance(data, dict) else None
+
+    if not isinstance(subrequests, list) or not subrequests:
+        return jsonify({"error": "requests doit être une liste non vide"}), 400
+    if len(subrequests) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Au plus {MAX_BATCH_SIZE} requêtes par batch"}), 400
+    if not all(isinstance(sub, dict) for sub in subrequests):
+        return jsonify({"error": "Chaque requête doit être un objet"}), 400
+
+    headers = {"Authorization": request.headers["Authorization"]}
+    if request.headers.get("Cookie"):
+        headers["Cookie"] = request.headers["Cookie"]
+
+    # A batch is a POST, but it is only a write if one of its sub-requests is
+    g.wrote = False
+    read_only = all(str(sub.get("method", "GET")).upper() == "GET" for sub in subrequests)
+    if not read_only:
+        # Reads that follow a write in the same batch must see it
+        g.read_stale = False
+
+    if data.get("parallel") and read_only:
+        app = current_app._get_current_object()
+        deadline = g.get("deadline")
+        with ThreadPoolExecutor(max_workers=min(len(subrequests), 8)) as pool:
+            responses = list(pool.map(
+                lambda sub: run_subrequest_in_own_context(app, sub, headers, deadline), subrequests
+            ))
+    else:
+        responses = [run_subrequest(sub, headers) for sub in subrequests]
+
+    return jsonify({"responses": responses})
+
+
+# --------------------------------------------------
+# Routes - Background Jobs
+# --------------------------------------------------
+EXPORTABLE_TABLES = {"users", "directors", "films", "marks"}
+
+
+@api.route("/jobs/<int:job_id>", methods=["GET"])
+def get_job(job_id):
+    job = Job.query.get(job_id)
+
+    if not job:
+        return jsonify({"error": "Job introuvable"}), 404
+
+    return jsonify(job.to_dict())
+
+
+@api.route("/exports", methods=["POST"])
+def create_export():
+    data = request.get_json()
+
+    if data.get("table") not in EXPORTABLE_TABLES:
+        return jsonify({"error": "table doit être users, directors, films ou marks"}), 400
+
+    job = enqueue_job("export", {"table": data["table"]})
+
+    return jsonify({"message": "Export planifié", "job": job.to_dict()}), 202
+
+
+# --------------------------------------------------
+# Application Factory
+# --------------------------------------------------
+def create_app(config=None):
+    """Build the Flask application.
+
+    Nothing here opens a database connection, so the app can be built once in
+    the gunicorn master (--preload) and shared copy-on-write by the workers.
+    Engines connect lazily in each worker, see post_fork in gunicorn.conf.py.
+    """
+    app = Flask(__name__)
+    app.secret_key = API_SECRET_KEY
+
+    # Database configuration
+    # DATABASE_URL (e.g. sqlite:////data/film.db on a single node) overrides DB_*
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url(DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD)
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Optional read replicas, used by GET requests (see routing.py)
+    app.config["SQLALCHEMY_BINDS"] = replica_binds()
+    app.config["USERS_FILE"] = "users.json"
+    app.config.update(config or {})
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    if "USERS" not in app.config:
+        app.config["USERS"] = load_users(app.config["USERS_FILE"])
+
+    # Cached entities are dropped a second time once replicas caught up
+    ENTITY_CACHE.replicas = bool(app.config["SQLALCHEMY_BINDS"])
+
+    # Initialize extensions
+    db.init_app(app)
+    with app.app_context():
+        # WAL, mmap and busy timeout pragmas for SQLite (see database.py)
+        for engine in db.engines.values():
+            tune_sqlite(engine)
+    # Preflights only reach flask_cors with EDGE_ENABLED=0
+    CORS(app, max_age=CORS_MAX_AGE)
+    # Snapshot reads are as stale as replica reads, writers are pinned for both
+    init_routing(app, stale_reads=snapshot.ENABLED)
+    init_compression(app)
+    deadlines.init_deadlines(app, db)
+
+    app.register_blueprint(api)
+    # Preflights and requests without a valid token never reach Flask
+    init_edge(app, SESSIONS, PUBLIC_PATHS)
+    return app
+
+
 # --------------------------------------------------
 # Database Initialization
 # --------------------------------------------------
-def init_db():
-    """Initialize the database"""
+def init_db(app):
+    """Initialize the database, seeding is left to the job worker"""
     with app.app_context():
         db.create_all()
-        seed_initial_data()
+        # Tables created by an older version (see migrations.py)
+        with db.engine.begin() as conn:
+            for step in upgrade_mark_table(conn, Mark.__table__):
+                print(f"🛠️ Upgraded the schema: {step}")
+        if db.engine.dialect.name == "postgresql":
+            with db.engine.begin() as conn:
+                install_triggers(conn)
+                search.install_search(conn)
+                directorstats.install_director_stats(conn)
+            # Own transaction: a failure here must not undo the triggers above
+            with db.engine.begin() as conn:
+                if ensure_mark_partitions(conn) is None:
+                    print("⚠️ mark is not partitioned, skipping partitions (see Mark Partitions in readme.md)")
+        enqueue_job("seed", unique=True)
         print("✅ Database tables created successfully")
 
 
 def seed_initial_data():
-    """Add initial data to the database"""
-    with app.app_context():
-        # Check if data already exists
-        if Utilisateur.query.first() is not None:
-            print("⚠️ Initial data already exists, skipping seed")
-            return
+    """Add initial data to the database (needs an application context).
+
+    Returns False when the database already had data; errors are raised so
+    the seed job is retried.
+    """
+    # Check if data already exists
+    if Utilisateur.query.first() is not None:
+        print("⚠️ Initial data already exists, skipping seed")
+        return False
 
-        try:
-            # Create directors
-            director1 = Director(name="Christopher", surname="Nolan")
-            director2 = Director(name="Lana", surname="Wachowski")
-            director3 = Director(name="Denis", surname="Villeneuve")
-            
-            db.session.add_all([director1, director2, director3])
-            db.session.flush()  # Get the IDs
-            
-            # Create users
-            user1 = Utilisateur(username="alice", mail="alice@example.com", langue="français")
-            user2 = Utilisateur(username="bob", mail="bob@example.com", langue="anglais")
-            user3 = Utilisateur(username="charlie", mail="charlie@example.com", langue="espagnol")
-            
-            db.session.add_all([user1, user2, user3])
-            db.session.flush()  # Get the IDs
-            
-            # Create user profiles
-            profile1 = UserProfile(
-                user_id=user1.id,
-                bio="Passionate about sci-fi films",
-                avatar_url="https://example.com/avatar1.jpg"
-            )
-            profile2 = UserProfile(
-                user_id=user2.id,
-                bio="Cinema classics lover",
-                avatar_url="https://example.com/avatar2.jpg"
-            )
-            profile3 = UserProfile(
-                user_id=user3.id,
-                bio="Adventure films critic",
-                avatar_url="https://example.com/avatar3.jpg"
-            )
-            
-            db.session.add_all([profile1, profile2, profile3])
-            db.session.flush()
-            
-            # Create films
-            film1 = Film(
-                titre="Inception",
-                annee=2010,
-                duree=148,
-                id_director=director1.id
-            )
-            film2 = Film(
-                titre="The Matrix",
-                annee=1999,
-                duree=136,
-                id_director=director2.id
-            )
-            film3 = Film(
-                titre="Interstellar",
-                annee=2014,
-                duree=169,
-                id_director=director1.id
-            )
-            
-            db.session.add_all([film1, film2, film3])
-            db.session.flush()  # Get the IDs
-            
-            # Create marks (ratings)
-            mark1 = Mark(id_film=film1.id, id_user=user1.id, mark=9)
-            mark2 = Mark(id_film=film2.id, id_user=user1.id, mark=8)
-            mark3 = Mark(id_film=film1.id, id_user=user2.id, mark=10)
-            mark4 = Mark(id_film=film3.id, id_user=user2.id, mark=7)
-            mark5 = Mark(id_film=film2.id, id_user=user3.id, mark=6)
-            mark6 = Mark(id_film=film3.id, id_user=user1.id, mark=9)
-            
-            db.session.add_all([mark1, mark2, mark3, mark4, mark5, mark6])
-            
-            # Commit all changes
-            db.session.commit()
-            
-            print("✅ Initial data added successfully")
-            print("   - 3 directors created")
-            print("   - 3 users created")
-            print("   - 3 user profiles created")
-            print("   - 3 films created")
-            print("   - 6 ratings created")
-            
-        except Exception as e:
-            db.session.rollback()
-            print(f"❌ Error adding initial data: {str(e)}")
+    try:
+        # Create directors
+        director1 = Director(name="Christopher", surname="Nolan")
+        director2 = Director(name="Lana", surname="Wachowski")
+        director3 = Director(name="Denis", surname="Villeneuve")
+        
+        db.session.add_all([director1, director2, director3])
+        db.session.flush()  # Get the IDs
+        
+        # Create users
+        user1 = Utilisateur(username="alice", mail="alice@example.com", langue="français")
+        user2 = Utilisateur(username="bob", mail="bob@example.com", langue="anglais")
+        user3 = Utilisateur(username="charlie", mail="charlie@example.com", langue="espagnol")
+        
+        db.session.add_all([user1, user2, user3])
+        db.session.flush()  # Get the IDs
+        
+        # Create user profiles
+        profile1 = UserProfile(
+            user_id=user1.id,
+            bio="Passionate about sci-fi films",
+            avatar_url="https://example.com/avatar1.jpg"
+        )
+        profile2 = UserProfile(
+            user_id=user2.id,
+            bio="Cinema classics lover",
+            avatar_url="https://example.com/avatar2.jpg"
+        )
+        profile3 = UserProfile(
+            user_id=user3.id,
+            bio="Adventure films critic",
+            avatar_url="https://example.com/avatar3.jpg"
+        )
+        
+        db.session.add_all([profile1, profile2, profile3])
+        db.session.flush()
+        
+        # Create films
+        film1 = Film(
+            titre="Inception",
+            annee=2010,
+            duree=148,
+            id_director=director1.id
+        )
+        film2 = Film(
+            titre="The Matrix",
+            annee=1999,
+            duree=136,
+            id_director=director2.id
+        )
+        film3 = Film(
+            titre="Interstellar",
+            annee=2014,
+            duree=169,
+            id_director=director1.id
+        )
+        
+        db.session.add_all([film1, film2, film3])
+        db.session.flush()  # Get the IDs
+        
+        # Create marks (ratings)
+        mark1 = Mark(id_film=film1.id, id_user=user1.id, mark=9)
+        mark2 = Mark(id_film=film2.id, id_user=user1.id, mark=8)
+        mark3 = Mark(id_film=film1.id, id_user=user2.id, mark=10)
+        mark4 = Mark(id_film=film3.id, id_user=user2.id, mark=7)
+        mark5 = Mark(id_film=film2.id, id_user=user3.id, mark=6)
+        mark6 = Mark(id_film=film3.id, id_user=user1.id, mark=9)
+        
+        db.session.add_all([mark1, mark2, mark3, mark4, mark5, mark6])
+        
+        # Commit all changes
+        db.session.commit()
+        
+        print("✅ Initial data added successfully")
+        print("   - 3 directors created")
+        print("   - 3 users created")
+        print("   - 3 user profiles created")
+        print("   - 3 films created")
+        print("   - 6 ratings created")
+        return True
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error adding initial data: {str(e)}")
+        raise
 
 
 # --------------------------------------------------
 # Application Launch
 # --------------------------------------------------
 if __name__ == "__main__":
-    init_db()
+    app = create_app()
+    init_db(app)
     print("🚀 Flask API running on http://127.0.0.1:5000")
     app.run(debug=True)
@@ -0,0 +1,80 @@
+"""CPU time versus bytes saved for each encoding on representative payloads.
+
+Usage: python benchmarks/bench_compression.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import STREAMS, compress  # noqa: E402
+
+LEVELS = {
+    "gzip": [1, 6, 9],
+    "br": [1, 4, 11],
+    "zstd": [1, 3, 19],
+}
+
+
+def films_payload(rows):
+    """Shape of GET /films: every row embeds its director"""
+    return json.dumps([
+        {
+            "id": i,
+            "titre": f"Film {i}",
+            "annee": 1950 + i % 75,
+            "duree": 80 + i % 100,
+            "id_director": i % 50,
+            "director": {"id": i % 50, "name": f"Prénom {i % 50}", "surname": f"Nom {i % 50}"},
+        }
+        for i in range(rows)
+    ]).encode()
+
+
+def marks_payload(rows):
+    """Shape of GET /marks"""
+    return json.dumps([
+        {"id": i, "id_film": i % 997, "id_user": i % 313, "mark": i % 11}
+        for i in range(rows)
+    ]).encode()
+
+
+def film_payload():
+    """Shape of GET /films/<id>, below the default threshold"""
+    return json.dumps({
+        "id": 1, "titre": "Inception", "annee": 2010, "duree": 148, "id_director": 1,
+        "director": {"id": 1, "name": "Christopher", "surname": "Nolan"},
+    }).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = {
+        "GET /films": films_payload(args.rows),
+        "GET /marks": marks_payload(args.rows),
+        "GET /films/<id>": film_payload(),
+    }
+
+    print(f"{'endpoint':<16} {'encoding':<10} {'raw':>9} {'compressed':>11} {'ratio':>6} {'ms/resp':>8}")
+    for endpoint, data in payloads.items():
+        for encoding in STREAMS:
+            for level in LEVELS[encoding]:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    out = compress(data, encoding, level)
+                elapsed = (time.perf_counter() - start) / args.repeat * 1000
+                print(
+                    f"{endpoint:<16} {encoding + '-' + str(level):<10} {len(data):>9} "
+                    f"{len(out):>11} {len(out) / len(data):>6.2f} {elapsed:>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Requests per second of browser-style traffic with and without the edge WSGI layer.
+
+Usage: python benchmarks/bench_edge.py [--requests 20000] [--rounds 5]
+                                       [--mix preflight=45,get_film=45,no_token=5,expired_token=5]
+
+Runs in process against an in-memory SQLite database: every request is a
+WSGI call of the appORM application with a prebuilt environ, so the numbers
+are the server-side cost of each kind of request, without the network.
+"before" calls the Flask dispatch directly (flask_cors answers preflights
+after check_token), "after" goes through edge.EdgeMiddleware first. Both
+replay the same random sequence of requests; the best of --rounds is kept.
+
+The benchmark only counts server work. In a browser, Access-Control-Max-Age
+also removes most preflights from the traffic.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+import appORM  # noqa: E402
+from appORM import SESSIONS, Director, Film, create_app, db  # noqa: E402
+from edge import EdgeMiddleware  # noqa: E402
+
+BENCH_TOKEN = "bench-token"
+ORIGIN = "http://localhost:3000"
+DEFAULT_MIX = "preflight=45,get_film=45,no_token=5,expired_token=5"
+
+
+def request_kinds(film_id):
+    """Environ of each kind of request a single-page app sends"""
+    def environ(method, headers):
+        return EnvironBuilder(path=f"/films/{film_id}", method=method, headers=headers).get_environ()
+
+    return {
+        "preflight": environ("OPTIONS", {
+            "Origin": ORIGIN,
+            "Access-Control-Request-Method": "GET",
+            "Access-Control-Request-Headers": "authorization",
+        }),
+        "get_film": environ("GET", {"Origin": ORIGIN, "Authorization": f"Bearer {BENCH_TOKEN}"}),
+        "no_token": environ("GET", {"Origin": ORIGIN}),
+        "expired_token": environ("GET", {"Origin": ORIGIN, "Authorization": "Bearer expired"}),
+    }
+
+
+def parse_mix(spec, kinds):
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in kinds:
+            raise SystemExit(f"Unknown request {name!r}, expected one of {', '.join(kinds)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def call(wsgi, environ):
+    statuses = []
+    body = wsgi(dict(environ), lambda status, headers, exc_info=None: statuses.append(status))
+    for _ in body:
+        pass
+    if hasattr(body, "close"):
+        body.close()
+    return statuses[0]
+
+
+def throughput(wsgi, environs, rounds):
+    """Best requests per second over rounds of the whole sequence"""
+    best = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for environ in environs:
+            call(wsgi, environ)
+        best = max(best, len(environs) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per round of the mix")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"request=weight pairs, default {DEFAULT_MIX}")
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "SQLALCHEMY_BINDS": {}, "USERS": {}})
+    if not isinstance(app.wsgi_app, EdgeMiddleware):
+        raise SystemExit("Run with EDGE_ENABLED=1")
+    variants = {"before": app.wsgi_app.app, "after": app.wsgi_app}
+
+    with app.app_context():
+        db.create_all()
+        director = Director(name="Christopher", surname="Nolan")
+        db.session.add(director)
+        db.session.flush()
+        film = Film(titre="Inception", annee=2010, duree=148, id_director=director.id)
+        db.session.add(film)
+        db.session.commit()
+        film_id = film.id
+
+    kinds = request_kinds(film_id)
+    mix = parse_mix(args.mix, kinds)
+    names, weights = list(mix), list(mix.values())
+    random.seed(0)
+    sequence = [kinds[name] for name in random.choices(names, weights, k=args.requests)]
+
+    SESSIONS[BENCH_TOKEN] = "bench"
+    limiter, appORM.LIMITER = appORM.LIMITER, None
+    try:
+        for name, environ in kinds.items():
+            statuses = {variant: call(wsgi, environ) for variant, wsgi in variants.items()}
+            print(f"{name:<14} before: {statuses['before']:<18} after: {statuses['after']}")
+
+        print(f"\n{'requests':<14} {'before req/s':>14} {'after req/s':>14} {'speedup':>9}")
+        rows = [(name, [kinds[name]] * max(args.requests // 10, 1)) for name in mix] + [("mix", sequence)]
+        for name, environs in rows:
+            before = throughput(variants["before"], environs, args.rounds)
+            after = throughput(variants["after"], environs, args.rounds)
+            print(f"{name:<14} {before:>14,.0f} {after:>14,.0f} {after / before:>8.1f}x")
+    finally:
+        appORM.LIMITER = limiter
+        SESSIONS.pop(BENCH_TOKEN, None)
+
+
+if __name__ == "__main__":
+    main()
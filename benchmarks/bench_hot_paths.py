@@ -0,0 +1,252 @@
+"""Microbenchmarks of the request hot paths, with saved baselines.
+
+Usage: python benchmarks/bench_hot_paths.py [--db sqlite|env] [--rows 500]
+                                            [--save NAME] [--compare NAME] [--threshold 10]
+
+--db sqlite (default) runs against an in-memory SQLite database, --db env
+against the database of the DB_* variables (a local Postgres). Each case is
+calibrated so that a round lasts at least a millisecond, then repeated for
+--min-time seconds; times are per call.
+
+--save writes the results to benchmarks/results/hot_paths-NAME.json.
+--compare prints the change of each median against such a file and exits
+with status 1 when a case got slower by more than --threshold percent.
+Baselines only compare runs on the same machine and database.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt  # noqa: E402
+from flask import jsonify  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+import appORM  # noqa: E402
+from appORM import (  # noqa: E402
+    SESSIONS, Director, Film, Mark, Utilisateur, check_token, create_app, create_mark, db,
+    validate_credentials,
+)
+from ratelimit import TokenBucketLimiter  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+BENCH_TOKEN = "bench-token"
+
+
+# --------------------------------------------------
+# Timing
+# --------------------------------------------------
+def measure(fn, min_time, min_rounds=5):
+    """Per-call statistics over rounds of `iterations` calls"""
+    fn()  # warm up caches, pools and prepared statements
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start >= 0.001 or iterations >= 1 << 20:
+            break
+        iterations *= 2
+
+    rounds = []
+    deadline = time.perf_counter() + min_time
+    while len(rounds) < min_rounds or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        rounds.append((time.perf_counter() - start) / iterations)
+
+    return {
+        "min": min(rounds),
+        "median": statistics.median(rounds),
+        "mean": statistics.fmean(rounds),
+        "stddev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "rounds": len(rounds),
+        "iterations": iterations,
+    }
+
+
+def fmt_us(seconds):
+    return f"{seconds * 1e6:,.1f}"
+
+
+# --------------------------------------------------
+# Fixtures
+# --------------------------------------------------
+def make_app(args):
+    rounds = args.bcrypt_rounds
+    config = {
+        "USERS": {BENCH_USER: bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()},
+    }
+    if args.db == "sqlite":
+        config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        config["SQLALCHEMY_BINDS"] = {}
+    return create_app(config)
+
+
+def populate(rows):
+    """rows films spread over rows // 10 directors, and one user"""
+    db.create_all()
+    directors = [Director(name=f"Prénom {i}", surname=f"Nom {i}") for i in range(max(rows // 10, 1))]
+    db.session.add_all(directors)
+    db.session.flush()
+    db.session.add_all([
+        Film(titre=f"Bench {i}", annee=1950 + i % 75, duree=80 + i % 100, id_director=directors[i % len(directors)].id)
+        for i in range(rows)
+    ])
+    user = Utilisateur(username=f"bench-{time.time_ns()}", mail=f"bench-{time.time_ns()}@example.com", langue="français")
+    db.session.add(user)
+    db.session.commit()
+    director_ids = [d.id for d in directors]
+    films = Film.query.filter(Film.id_director.in_(director_ids)).options(joinedload(Film.director)).all()
+    return films, director_ids, user.id
+
+
+def cleanup(director_ids, user_id):
+    """Remove the benchmark rows, for runs against a persistent database"""
+    Mark.query.filter_by(id_user=user_id).delete()
+    Film.query.filter(Film.id_director.in_(director_ids)).delete()
+    Director.query.filter(Director.id.in_(director_ids)).delete()
+    Utilisateur.query.filter_by(id=user_id).delete()
+    db.session.commit()
+
+
+# --------------------------------------------------
+# Cases
+# --------------------------------------------------
+def run_cases(app, args):
+    results = {}
+
+    def record(name, fn):
+        results[name] = stats = measure(fn, args.min_time)
+        print(f"{name:<44} {fmt_us(stats['min']):>12} {fmt_us(stats['median']):>12} "
+              f"{fmt_us(stats['stddev']):>10} {stats['rounds']:>7}")
+
+    print(f"{'case':<44} {'min µs':>12} {'median µs':>12} {'stddev':>10} {'rounds':>7}")
+    with app.app_context():
+        films, director_ids, user_id = populate(args.rows)
+        film_id = films[0].id
+        dicts = [f.to_dict() for f in films]
+
+        record(f"Film.to_dict x{len(films)} (director loaded)", lambda: [f.to_dict() for f in films])
+
+        def hydrate():
+            Film.query.filter(Film.id_director.in_(director_ids)).options(joinedload(Film.director)).all()
+            db.session.expunge_all()
+
+        record(f"ORM hydration Film+director x{args.rows}", hydrate)
+
+        with app.test_request_context("/films"):
+            for size in (10, 100, len(dicts)):
+                record(f"jsonify {size} film dicts", lambda size=size: jsonify(dicts[:size]))
+
+        SESSIONS[BENCH_TOKEN] = BENCH_USER
+        headers = {"Authorization": f"Bearer {BENCH_TOKEN}"}
+        limiter = appORM.LIMITER
+        try:
+            appORM.LIMITER = None
+            with app.test_request_context("/films", headers=headers):
+                record("check_token (no rate limit)", check_token)
+
+            path = os.path.join(tempfile.mkdtemp(), "bench_ratelimit.sqlite3")
+            appORM.LIMITER = TokenBucketLimiter(path, {"default": (10 ** 9, 1)})
+            with app.test_request_context("/films", headers=headers):
+                record("check_token + token bucket", check_token)
+        finally:
+            appORM.LIMITER = limiter
+            SESSIONS.pop(BENCH_TOKEN, None)
+
+        with app.test_request_context("/login", method="POST"):
+            record(f"validate_credentials (bcrypt cost {args.bcrypt_rounds})",
+                   lambda: validate_credentials(BENCH_USER, BENCH_PASSWORD))
+
+        body = {"id_film": film_id, "id_user": user_id, "mark": 7}
+
+        def post_mark():
+            with app.test_request_context("/marks", method="POST", json=body):
+                create_mark()
+
+        post_mark()  # the first call inserts, the measured ones update
+        record("create_mark queries (update path)", post_mark)
+
+        cleanup(director_ids, user_id)
+
+    return results
+
+
+# --------------------------------------------------
+# Baselines
+# --------------------------------------------------
+def result_path(name):
+    return os.path.join(RESULTS_DIR, f"hot_paths-{name}.json")
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each median, return the cases slower than threshold %"""
+    regressions = []
+    print(f"\n{'case':<44} {'baseline µs':>12} {'now µs':>12} {'change':>8}")
+    for name, stats in results.items():
+        before = baseline["cases"].get(name)
+        if before is None:
+            print(f"{name:<44} {'-':>12} {fmt_us(stats['median']):>12} {'new':>8}")
+            continue
+        change = (stats["median"] - before["median"]) / before["median"] * 100
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  ⚠️ regression"
+        print(f"{name:<44} {fmt_us(before['median']):>12} {fmt_us(stats['median']):>12} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", choices=["sqlite", "env"], default="sqlite")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per case")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="cost of the hashes in users.json")
+    parser.add_argument("--save", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(result_path(args.compare)) as f:
+            baseline = json.load(f)
+
+    results = run_cases(make_app(args), args)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(result_path(args.save), "w") as f:
+            json.dump({
+                "meta": {
+                    "date": datetime.utcnow().isoformat(),
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "db": args.db,
+                    "rows": args.rows,
+                },
+                "cases": results,
+            }, f, indent=2)
+        print(f"\nSaved {result_path(args.save)}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
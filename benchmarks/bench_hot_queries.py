@@ -0,0 +1,84 @@
+"""ORM lookups versus the prepared hot-query layer on the PK-lookup routes.
+
+Usage: python benchmarks/bench_hot_queries.py --database-url URL [--repeat 2000] [--seed]
+
+Runs against --database-url (or DATABASE_URL), never the DB_* settings of
+the API; use a throwaway local Postgres for prepared statements. Tables are
+created and seeded only in a database without them; a database that has the
+tables but no film is seeded only with --seed, and one with films is just
+read. Every iteration starts from an empty session, like a request does. "cpu" is the client process CPU; the server side saving
+(parse + plan) shows up in the wall time.
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import inspect
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hotqueries  # noqa: E402
+from appORM import create_app, db, Film, Utilisateur, UserProfile, seed_initial_data  # noqa: E402
+
+
+def timed(fn, repeat):
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(repeat):
+        fn()
+        db.session.expunge_all()
+    return (time.perf_counter() - wall) / repeat * 1e6, (time.process_time() - cpu) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="default DATABASE_URL")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", action="store_true", help="seed a database whose tables exist but hold no film")
+    args = parser.parse_args()
+    if not args.database_url:
+        raise SystemExit("Pass --database-url (or DATABASE_URL) of a throwaway database")
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url, "SQLALCHEMY_BINDS": {}})
+    with app.app_context():
+        if not inspect(db.engine).has_table(Film.__tablename__):
+            db.create_all()
+            seed_initial_data()
+        elif Film.query.first() is None:
+            if not args.seed:
+                raise SystemExit("The database has the tables but no film; pass --seed to add the sample data")
+            seed_initial_data()
+        film_id = Film.query.first().id
+        user_id = Utilisateur.query.first().id
+
+        cases = {
+            "GET /films/<id>": (
+                lambda: Film.query.get(film_id).to_dict(),
+                lambda: hotqueries.find_film(db.session, film_id),
+            ),
+            "GET /users/<id>": (
+                lambda: Utilisateur.query.get(user_id).to_dict(),
+                lambda: hotqueries.find_user(db.session, user_id),
+            ),
+            "GET /users/<id>/profile": (
+                lambda: UserProfile.query.filter_by(user_id=user_id).first().to_dict(),
+                lambda: hotqueries.find_profile(db.session, user_id),
+            ),
+            "POST /marks checks": (
+                lambda: (Film.query.get(film_id), Utilisateur.query.get(user_id)),
+                lambda: (hotqueries.find_film(db.session, film_id), hotqueries.find_user(db.session, user_id)),
+            ),
+        }
+
+        print(f"{'route':<24} {'orm µs':>9} {'orm cpu':>9} {'hot µs':>9} {'hot cpu':>9}")
+        for route, (orm, hot) in cases.items():
+            # Warm up the pool, the compiled cache and the prepared statements
+            timed(orm, 50)
+            timed(hot, 50)
+            orm_wall, orm_cpu = timed(orm, args.repeat)
+            hot_wall, hot_cpu = timed(hot, args.repeat)
+            print(f"{route:<24} {orm_wall:>9.1f} {orm_cpu:>9.1f} {hot_wall:>9.1f} {hot_cpu:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Cold start time and per-worker memory of gunicorn for several worker models.
+
+Each configuration is "worker_class:workers:threads:preload", for example
+    python benchmarks/bench_startup.py sync:4:1:0 sync:4:1:1 gthread:2:8:1
+
+Linux only: memory is read from /proc/<pid>/smaps_rollup. RSS counts pages
+shared copy-on-write with the master, PSS splits them between the processes
+sharing them, so a lower PSS with --preload is the memory actually saved.
+"""
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_response(port, timeout=60):
+    """Wait until a worker answers HTTP: the port opens before workers without --preload import the app"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return True
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.02)
+        finally:
+            conn.close()
+    return False
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0][:-1]] = int(parts[1])
+    return values["Rss"], values["Pss"]
+
+
+def measure(spec, port, app):
+    worker_class, workers, threads, preload = spec.split(":")
+    env = dict(
+        os.environ,
+        GUNICORN_APP=app,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_WORKERS=workers,
+        GUNICORN_THREADS=threads,
+        GUNICORN_PRELOAD=preload,
+    )
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_for_response(port):
+            return f"{spec:<20} did not start"
+        cold_start = time.monotonic() - start
+
+        # Give every worker the time to boot before reading its memory
+        deadline = time.monotonic() + 30
+        while len(children(proc.pid)) < int(workers) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+
+        master_rss, master_pss = memory_kb(proc.pid)
+        workers_mem = [memory_kb(pid) for pid in children(proc.pid)]
+        rss = sum(m[0] for m in workers_mem) / len(workers_mem)
+        pss = sum(m[1] for m in workers_mem) / len(workers_mem)
+        total_pss = master_pss + sum(m[1] for m in workers_mem)
+        return (
+            f"{spec:<20} {cold_start:>8.2f} {master_rss / 1024:>10.1f} "
+            f"{rss / 1024:>10.1f} {pss / 1024:>10.1f} {total_pss / 1024:>10.1f}"
+        )
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    specs = sys.argv[1:] or ["sync:4:1:0", "sync:4:1:1", "gthread:2:8:1"]
+    app = os.getenv("GUNICORN_APP", "app:create_app()")
+    print(f"{'config':<20} {'start s':>8} {'master MB':>10} {'RSS MB/w':>10} {'PSS MB/w':>10} {'total PSS':>10}")
+    for i, spec in enumerate(specs):
+        print(measure(spec, 5100 + i, app), flush=True)
+
+
+if __name__ == "__main__":
+    main()
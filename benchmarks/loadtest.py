@@ -0,0 +1,341 @@
+"""Load generator replaying a realistic traffic mix against a running API.
+
+Usage:
+    python benchmarks/loadtest.py --url http://localhost:5000 --users 32 --duration 60 \\
+        --label "4 sync workers" --save sync-4
+    python benchmarks/loadtest.py --compare sync-4,gthread-2x8
+
+Each virtual user logs in through /login, then loops over operations drawn
+from --mix (closed loop: a user waits for its response before the next
+request, --think adds a pause). Requests of the --warmup period are not
+counted. Throughput and p50/p95/p99 latencies are reported per operation;
+--save writes them to benchmarks/results/loadtest-NAME.json and --compare
+prints saved runs side by side.
+
+Start the server with RATE_LIMIT_ENABLED=0, or the token buckets answer 429
+to most of the load.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+DEFAULT_MIX = "list_films=35,film_marks=30,get_film=10,post_mark=20,create_film=3,delete_film=1,delete_mark=1"
+
+
+def parse_mix(spec):
+    """Parse "operation=weight,..." into {operation: weight}"""
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}, expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --------------------------------------------------
+# HTTP client, one keep-alive connection per virtual user
+# --------------------------------------------------
+class Client:
+    def __init__(self, url, accept_gzip):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.accept_gzip = accept_gzip
+        self.token = None
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """(status, parsed JSON body or None); status 0 on a connection error"""
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self.accept_gzip:
+            headers["Accept-Encoding"] = "gzip"
+        payload = json.dumps(body) if body is not None else None
+        try:
+            if self.conn is None:
+                cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.conn = cls(self.host, self.port, timeout=30)
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, None
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+
+
+# --------------------------------------------------
+# Operations: (method, path) of the request, and ids shared by the users
+# --------------------------------------------------
+class Pool:
+    """Ids the operations pick from, and those the run created (to delete)"""
+
+    def __init__(self, films, users):
+        self.lock = threading.Lock()
+        self.films = films
+        self.users = users
+        self.created_films = []
+        self.created_marks = []
+
+    def take(self, items):
+        with self.lock:
+            return items.pop(random.randrange(len(items))) if items else None
+
+
+def op_list_films(client, pool):
+    return client.request("GET", "/films")
+
+
+def op_get_film(client, pool):
+    return client.request("GET", f"/films/{random.choice(pool.films)}")
+
+
+def op_film_marks(client, pool):
+    return client.request("GET", f"/films/{random.choice(pool.films)}/marks")
+
+
+def op_post_mark(client, pool):
+    body = {"id_film": random.choice(pool.films), "id_user": random.choice(pool.users), "mark": random.randint(0, 10)}
+    status, data = client.request("POST", "/marks", body)
+    if status == 201 and data and data.get("mark", {}).get("id"):
+        with pool.lock:
+            pool.created_marks.append(data["mark"]["id"])
+    return status, data
+
+
+def op_create_film(client, pool):
+    body = {"titre": f"Load test {random.getrandbits(32):08x}", "annee": random.randint(1950, 2024), "duree": random.randint(80, 180)}
+    status, data = client.request("POST", "/films", body)
+    if status == 201 and data and data.get("film", {}).get("id"):
+        with pool.lock:
+            pool.created_films.append(data["film"]["id"])
+    return status, data
+
+
+def op_delete_film(client, pool):
+    film_id = pool.take(pool.created_films)
+    if film_id is None:
+        return op_create_film(client, pool)
+    return client.request("DELETE", f"/films/{film_id}")
+
+
+def op_delete_mark(client, pool):
+    mark_id = pool.take(pool.created_marks)
+    if mark_id is None:
+        return op_post_mark(client, pool)
+    return client.request("DELETE", f"/marks/{mark_id}")
+
+
+OPERATIONS = {
+    "list_films": op_list_films,
+    "get_film": op_get_film,
+    "film_marks": op_film_marks,
+    "post_mark": op_post_mark,
+    "create_film": op_create_film,
+    "delete_film": op_delete_film,
+    "delete_mark": op_delete_mark,
+}
+
+
+# --------------------------------------------------
+# Run
+# --------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, name, seconds, status):
+        with self.lock:
+            self.latencies[name].append(seconds * 1000)
+            self.statuses[name][status] += 1
+
+
+def login(client, args):
+    status, data = client.request("POST", "/login", {"username": args.username, "password": args.password})
+    if status != 200:
+        raise SystemExit(f"Login failed ({status}): {data}")
+    client.token = data["token"]
+
+
+def virtual_user(args, mix, pool, recorder, start, stop):
+    client = Client(args.url, args.gzip)
+    login(client, args)
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < stop:
+        name = random.choices(names, weights)[0]
+        begin = time.monotonic()
+        status, _ = OPERATIONS[name](client, pool)
+        if begin >= start:
+            recorder.add(name, time.monotonic() - begin, status)
+        if args.think:
+            time.sleep(random.expovariate(1 / args.think))
+    client.close()
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(latencies, statuses, duration):
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status == 0 or int(status) >= 400)
+    return {
+        "requests": len(values),
+        "rps": round(len(values) / duration, 1),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(values, 50), 2) if values else None,
+        "p95_ms": round(percentile(values, 95), 2) if values else None,
+        "p99_ms": round(percentile(values, 99), 2) if values else None,
+        "max_ms": round(values[-1], 2) if values else None,
+    }
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    setup = Client(args.url, args.gzip)
+    login(setup, args)
+    status, films = setup.request("GET", "/films")
+    status_users, users = setup.request("GET", "/users")
+    if status != 200 or status_users != 200 or not films or not users:
+        raise SystemExit("The API needs at least one film and one user (run the seed)")
+    pool = Pool([f["id"] for f in films], [u["id"] for u in users])
+    setup.close()
+
+    recorder = Recorder()
+    start = time.monotonic() + args.warmup
+    stop = start + args.duration
+    threads = [
+        threading.Thread(target=virtual_user, args=(args, mix, pool, recorder, start, stop), daemon=True)
+        for _ in range(args.users)
+    ]
+    print(f"🚀 {args.users} users for {args.warmup:g}s warm-up + {args.duration:g}s against {args.url}")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    operations = {
+        name: summarize(recorder.latencies[name], recorder.statuses[name], args.duration)
+        for name in mix if recorder.latencies[name]
+    }
+    all_statuses = defaultdict(int)
+    for counts in recorder.statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] += count
+    total = summarize([v for values in recorder.latencies.values() for v in values], all_statuses, args.duration)
+    return {
+        "meta": {
+            "date": datetime.utcnow().isoformat(),
+            "label": args.label,
+            "url": args.url,
+            "users": args.users,
+            "duration": args.duration,
+            "think": args.think,
+            "mix": mix,
+        },
+        "operations": operations,
+        "total": total,
+    }
+
+
+# --------------------------------------------------
+# Reports
+# --------------------------------------------------
+def print_report(result):
+    print(f"\n{'operation':<14} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = list(result["operations"].items()) + [("total", result["total"])]
+    for name, stats in rows:
+        print(f"{name:<14} {stats['requests']:>9} {stats['rps']:>8} {stats['errors']:>7} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+    if result["total"]["errors"]:
+        print(f"\nStatus codes: {result['total']['statuses']}")
+
+
+def result_path(name):
+    return os.path.join(RESULTS_DIR, f"loadtest-{name}.json")
+
+
+def print_comparison(names):
+    runs = {}
+    for name in names:
+        with open(result_path(name)) as f:
+            runs[name] = json.load(f)
+
+    for name, run in runs.items():
+        meta = run["meta"]
+        print(f"{name}: {meta['label'] or '-'} ({meta['users']} users, {meta['duration']}s, {meta['date']})")
+
+    operations = []
+    for run in runs.values():
+        operations += [op for op in run["operations"] if op not in operations]
+    print(f"\n{'operation':<14} {'run':<20} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for op in operations + ["total"]:
+        for name, run in runs.items():
+            stats = run["total"] if op == "total" else run["operations"].get(op)
+            if stats:
+                print(f"{op:<14} {name:<20} {stats['rps']:>8} {stats['errors']:>7} "
+                      f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("LOADTEST_URL", "http://localhost:5000"))
+    parser.add_argument("--username", default=os.getenv("LOADTEST_USERNAME", "john_doe"))
+    parser.add_argument("--password", default=os.getenv("LOADTEST_PASSWORD", "password123"))
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds not counted")
+    parser.add_argument("--think", type=float, default=0, help="mean pause between requests of a user, in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation=weight pairs, default {DEFAULT_MIX}")
+    parser.add_argument("--no-gzip", dest="gzip", action="store_false", help="do not send Accept-Encoding: gzip")
+    parser.add_argument("--label", default="", help="free text saved with the results, e.g. the server settings")
+    parser.add_argument("--save", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME,NAME", help="print saved runs side by side and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        print_comparison([name.strip() for name in args.compare.split(",") if name.strip()])
+        return
+
+    result = run(args)
+    print_report(result)
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(result_path(args.save), "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {result_path(args.save)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
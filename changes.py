@@ -0,0 +1,133 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+
+
+# --------------------------------------------------
+# Change feed of the catalogue
+# --------------------------------------------------
+PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "500"))
+STREAM_POLL_SECONDS = float(os.getenv("CHANGES_STREAM_POLL_SECONDS", "1"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("CHANGES_STREAM_HEARTBEAT_SECONDS", "15"))
+# A stream is closed after this long, well under the gunicorn worker timeout
+# (GUNICORN_TIMEOUT, 120 s); clients reconnect with Last-Event-ID
+STREAM_MAX_SECONDS = float(os.getenv("CHANGES_STREAM_MAX_SECONDS", "55"))
+# Reconnection delay sent to EventSource clients, in milliseconds
+STREAM_RETRY_MS = int(os.getenv("CHANGES_STREAM_RETRY_MS", "1000"))
+# 0 keeps the whole history
+RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+
+# On Postgres every change records the id of its transaction. A page only
+# contains changes of transactions older than every transaction still running
+# (the snapshot xmin), in (txid, seq) order, so a change can never show up
+# later behind a position a client already passed. SQLite runs one write
+# transaction at a time, seq order is commit order there.
+PG_TXID = "pg_current_xact_id()::text::bigint"
+PG_HORIZON = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+def watch_sessions(session_class, table, models):
+    """Log every insert, update and delete of `models` in the flushing transaction.
+
+    models maps a mapped class to its entity name in the feed. Core statements
+    bypass this hook and call record() themselves (see ingest.upsert_marks).
+    """
+
+    @event.listens_for(session_class, "after_flush")
+    def log_changes(session, flush_context):
+        changes = []
+        for obj in session.new:
+            if type(obj) in models:
+                changes.append((models[type(obj)], obj.id, "upsert", obj.to_dict()))
+        for obj in session.dirty:
+            if type(obj) in models and session.is_modified(obj, include_collections=False):
+                changes.append((models[type(obj)], obj.id, "upsert", obj.to_dict()))
+        for obj in session.deleted:
+            if type(obj) in models:
+                changes.append((models[type(obj)], obj.id, "delete", None))
+        if changes:
+            record(session.connection(), table, changes)
+
+
+def record(conn, table, changes):
+    """Insert (entity, entity_id, op, data) tuples in the transaction of conn"""
+    stmt = table.insert()
+    if conn.dialect.name == "postgresql":
+        stmt = stmt.values(txid=text(PG_TXID))
+    now = datetime.utcnow()
+    conn.execute(stmt, [
+        {"entity": entity, "entity_id": entity_id, "op": op, "data": data, "created_at": now}
+        for entity, entity_id, op, data in changes
+    ])
+
+
+# --------------------------------------------------
+# Reading
+# --------------------------------------------------
+class ExpiredPosition(Exception):
+    """The change a client last saw was pruned, it has to download everything again"""
+
+
+def _after(session, table, since, entities):
+    """Select of the committed changes after `since`, and whether the feed is ordered by txid"""
+    postgres = session.get_bind().dialect.name == "postgresql"
+    query = table.select()
+    if entities:
+        query = query.where(table.c.entity.in_(entities))
+
+    if since:
+        last = session.execute(table.select().where(table.c.seq == since)).mappings().first()
+        if last is None:
+            raise ExpiredPosition()
+        if postgres:
+            query = query.where(
+                (table.c.txid > last["txid"]) | ((table.c.txid == last["txid"]) & (table.c.seq > since))
+            )
+        else:
+            query = query.where(table.c.seq > since)
+
+    if postgres:
+        query = query.where(table.c.txid < text(PG_HORIZON))
+    return query, postgres
+
+
+def read_changes(session, table, since, limit, entities=None):
+    """Changes after the one numbered `since` (0: from the start), oldest first"""
+    query, postgres = _after(session, table, since, entities)
+    order = (table.c.txid, table.c.seq) if postgres else (table.c.seq,)
+    rows = session.execute(query.order_by(*order).limit(limit + 1)).mappings().all()
+    return [to_dict(row) for row in rows[:limit]], len(rows) > limit
+
+
+def last_change(session, table, since, entities=None):
+    """seq of the newest change after `since`, None when nothing changed"""
+    query, postgres = _after(session, table, since, entities)
+    order = (table.c.txid.desc(), table.c.seq.desc()) if postgres else (table.c.seq.desc(),)
+    row = session.execute(query.order_by(*order).limit(1)).mappings().first()
+    return row["seq"] if row is not None else None
+
+
+def to_dict(row):
+    return {
+        "seq": row["seq"],
+        "entity": row["entity"],
+        "id": row["entity_id"],
+        "op": row["op"],
+        "data": row["data"],
+        "at": row["created_at"].isoformat() if row["created_at"] else None,
+    }
+
+
+def sse_event(change):
+    return f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+
+
+def prune(engine, table, retention_days=RETENTION_DAYS):
+    """Delete the changes older than the retention, returns the number deleted"""
+    if not retention_days:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    with engine.begin() as conn:
+        return conn.execute(table.delete().where(table.c.created_at < cutoff)).rowcount
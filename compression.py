@@ -0,0 +1,152 @@
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# --------------------------------------------------
+# Configuration
+# --------------------------------------------------
+# Bodies smaller than this are sent as is, compressing them costs more than it saves
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+LEVELS = {
+    "gzip": int(os.getenv("COMPRESS_GZIP_LEVEL", "6")),
+    "br": int(os.getenv("COMPRESS_BR_LEVEL", "4")),
+    "zstd": int(os.getenv("COMPRESS_ZSTD_LEVEL", "3")),
+}
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/csv", "text/event-stream"}
+
+
+# --------------------------------------------------
+# Streaming compressors
+# --------------------------------------------------
+class GzipStream:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        return self._obj.compress(chunk) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class BrotliStream:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self._obj.process(chunk) + self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class ZstdStream:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk):
+        return self._obj.compress(chunk) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+STREAMS = {"gzip": GzipStream}
+if brotli is not None:
+    STREAMS["br"] = BrotliStream
+if zstandard is not None:
+    STREAMS["zstd"] = ZstdStream
+
+# Preferred order when the client accepts several encodings with the same weight
+PREFERENCE = ["zstd", "br", "gzip"]
+
+
+def compress(data, encoding, level=None):
+    """Compress a whole body in one go"""
+    stream = STREAMS[encoding](LEVELS[encoding] if level is None else level)
+    return stream.compress(data) + stream.finish()
+
+
+def negotiate(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+
+    candidates = [
+        enc for enc in PREFERENCE
+        if enc in STREAMS and weights.get(enc, weights.get("*", 0)) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda enc: weights.get(enc, weights.get("*", 0)))
+
+
+def _stream_body(chunks, stream):
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+# --------------------------------------------------
+# Response hook
+# --------------------------------------------------
+def init_compression(app):
+    @app.after_request
+    def compress_response(response):
+        """Compress responses according to Accept-Encoding"""
+        response.vary.add("Accept-Encoding")
+
+        if (
+            request.method == "HEAD"
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        encoding = negotiate(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            # Flush after every chunk so streamed events are not held back
+            stream = STREAMS[encoding](LEVELS[encoding])
+            response.response = _stream_body(response.response, stream)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < MIN_SIZE:
+                return response
+            response.set_data(compress(data, encoding))
+
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,59 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+# --------------------------------------------------
+# Database URL and embedded SQLite tuning
+# --------------------------------------------------
+# Pages of the database file mapped in memory, and page cache per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))
+# How long a writer waits for the database lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Connections kept open by the pool; match gunicorn threads or more
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "16"))
+
+
+def database_url(host, port, name, user, password):
+    """DATABASE_URL when set, else the Postgres URL built from the DB_* settings"""
+    return os.getenv("DATABASE_URL") or f"postgresql://{user}:{password}@{host}:{port}/{name}"
+
+
+def is_sqlite_file(url):
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the URL: a pool shared by the threads for SQLite files"""
+    if not is_sqlite_file(url):
+        return {}
+    return {
+        # SQLAlchemy's default QueuePool: a connection is checked out by one
+        # thread at a time and returned after the request
+        "pool_size": SQLITE_POOL_SIZE,
+        "connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    }
+
+
+def tune_sqlite(engine):
+    """Set the pragmas of every new SQLite connection (no-op on other backends)"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        # Readers no longer block the writer and the other way round
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Durable at each checkpoint, not each commit; safe against corruption in WAL mode
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        # Off by default in SQLite; the schema relies on them like on Postgres
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
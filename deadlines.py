@@ -0,0 +1,113 @@
+import os
+import time
+
+from flask import g, has_app_context, jsonify, request
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+
+# --------------------------------------------------
+# Per-request deadlines, enforced by Postgres statement_timeout
+# --------------------------------------------------
+ENABLED = os.getenv("REQUEST_DEADLINES_ENABLED", "1") == "1"
+DEFAULT_DEADLINES = "default=10000,get_marks=5000,search_all=3000,batch=20000"
+
+
+def parse_budgets(spec):
+    """Parse "endpoint=milliseconds,..." into {endpoint: milliseconds}
+
+    Raises ValueError naming the first malformed entry.
+    """
+    budgets = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        endpoint, _, ms = item.partition("=")
+        if not endpoint.strip() or not ms.strip().isdigit() or int(ms) <= 0:
+            raise ValueError(f"invalid request deadline {item!r}, expected endpoint=milliseconds")
+        budgets[endpoint.strip()] = int(ms)
+    return budgets
+
+
+try:
+    # Keyed by view name, "default" for the others
+    BUDGETS = parse_budgets(os.getenv("REQUEST_DEADLINES", DEFAULT_DEADLINES))
+except ValueError as e:
+    print(f"⚠️ REQUEST_DEADLINES: {e}; using {DEFAULT_DEADLINES}")
+    BUDGETS = parse_budgets(DEFAULT_DEADLINES)
+
+# Clients can only tighten their budget, never extend it
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+# Below this, a query is not worth starting
+MIN_STATEMENT_MS = 10
+
+QUERY_CANCELED = "57014"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def budget_ms(endpoint):
+    view = (endpoint or "default").rpartition(".")[2]
+    budget = BUDGETS.get(view, BUDGETS.get("default"))
+    requested = request.headers.get(TIMEOUT_HEADER, "")
+    if requested.isdigit() and int(requested) > 0:
+        budget = min(budget, int(requested)) if budget else int(requested)
+    return budget
+
+
+def remaining_ms():
+    """Milliseconds left for the current request, None without a deadline"""
+    if not has_app_context() or g.get("deadline") is None:
+        return None
+    return int((g.deadline - time.monotonic()) * 1000)
+
+
+def is_deadline_error(error):
+    if isinstance(error, DeadlineExceeded):
+        return True
+    return isinstance(error, OperationalError) and getattr(error.orig, "pgcode", None) == QUERY_CANCELED
+
+
+def timeout_response():
+    response = jsonify({"error": "Délai de traitement dépassé"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+def watch_sessions(session_class):
+    """Give every transaction of a request what is left of the request's budget"""
+
+    @event.listens_for(session_class, "after_begin")
+    def set_statement_timeout(session, transaction, connection):
+        remaining = remaining_ms()
+        if remaining is None:
+            return
+        if remaining < MIN_STATEMENT_MS:
+            raise DeadlineExceeded()
+        if connection.dialect.name == "postgresql":
+            # SET LOCAL ends with the transaction, pooled connections keep the server default
+            connection.execute(text(f"SET LOCAL statement_timeout = {remaining}"))
+
+
+def init_deadlines(app, db):
+    """Start each request's clock and turn an exhausted budget into a 503"""
+
+    @app.before_request
+    def start_deadline():
+        if ENABLED and request.method != "OPTIONS":
+            budget = budget_ms(request.endpoint)
+            if budget:
+                g.deadline = time.monotonic() + budget / 1000
+
+    @app.errorhandler(DeadlineExceeded)
+    @app.errorhandler(OperationalError)
+    def deadline_exceeded(error):
+        if not is_deadline_error(error):
+            raise error
+        db.session.rollback()
+        app.logger.warning(f"Deadline exceeded on {request.method} {request.path}")
+        return timeout_response()
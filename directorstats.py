@@ -0,0 +1,67 @@
+import os
+
+from sqlalchemy import text
+
+
+# --------------------------------------------------
+# Per-director rating stats, precomputed in a materialized view (Postgres)
+# --------------------------------------------------
+REFRESH_SECONDS = int(os.getenv("DIRECTOR_STATS_REFRESH_SECONDS", "60"))
+
+CREATE_VIEW_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS director_stats AS
+SELECT d.id AS director_id,
+       count(DISTINCT f.id) AS film_count,
+       avg(m.mark)::float8 AS mean_rating,
+       count(m.mark) AS total_votes,
+       now() AT TIME ZONE 'utc' AS refreshed_at
+FROM director d
+LEFT JOIN film f ON f.id_director = d.id
+LEFT JOIN mark m ON m.id_film = f.id
+GROUP BY d.id
+"""
+
+# Same columns computed live, for a director newer than the last refresh or
+# for databases without materialized views
+LIVE_STATS_SQL = text(
+    "SELECT count(DISTINCT f.id) AS film_count, avg(m.mark) AS mean_rating, count(m.mark) AS total_votes "
+    "FROM film f LEFT JOIN mark m ON m.id_film = f.id WHERE f.id_director = :id"
+)
+VIEW_STATS_SQL = text(
+    "SELECT film_count, mean_rating, total_votes, refreshed_at FROM director_stats WHERE director_id = :id"
+)
+
+
+def install_director_stats(conn):
+    """Create the view and the unique index REFRESH ... CONCURRENTLY needs (idempotent)"""
+    conn.execute(text(CREATE_VIEW_SQL))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_director_stats_director ON director_stats (director_id)"
+    ))
+
+
+def refresh_director_stats(engine):
+    """Recompute the view without blocking the readers of the previous contents"""
+    with engine.begin() as conn:
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY director_stats"))
+
+
+def director_stats(session, director_id):
+    """One index lookup on Postgres; aggregates the director's films elsewhere"""
+    if session.get_bind().dialect.name == "postgresql":
+        row = session.execute(VIEW_STATS_SQL, {"id": director_id}).mappings().first()
+        if row is not None:
+            return _shape(row, row["refreshed_at"].isoformat())
+
+    row = session.execute(LIVE_STATS_SQL, {"id": director_id}).mappings().first()
+    return _shape(row, None)
+
+
+def _shape(row, as_of):
+    mean = row["mean_rating"]
+    return {
+        "film_count": row["film_count"],
+        "mean_rating": round(float(mean), 2) if mean is not None else None,
+        "total_votes": row["total_votes"],
+        "as_of": as_of,
+    }
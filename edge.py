@@ -0,0 +1,88 @@
+import json
+import os
+
+
+# --------------------------------------------------
+# WSGI layer answering CORS preflights and bad tokens before Flask
+# --------------------------------------------------
+ENABLED = os.getenv("EDGE_ENABLED", "1") == "1"
+ALLOW_ORIGIN = os.getenv("CORS_ALLOW_ORIGIN", "*")
+ALLOW_METHODS = os.getenv("CORS_ALLOW_METHODS", "GET, POST, PUT, DELETE, OPTIONS")
+ALLOW_HEADERS = os.getenv("CORS_ALLOW_HEADERS", "Content-Type, Authorization, Last-Event-ID")
+# How long a browser reuses a preflight answer; Chrome caps it at 7200 seconds,
+# Firefox at 86400
+MAX_AGE = int(os.getenv("CORS_MAX_AGE", "86400"))
+
+PREFLIGHT_HEADERS = [
+    ("Access-Control-Allow-Origin", ALLOW_ORIGIN),
+    ("Access-Control-Allow-Methods", ALLOW_METHODS),
+    ("Access-Control-Allow-Headers", ALLOW_HEADERS),
+    ("Access-Control-Max-Age", str(MAX_AGE)),
+]
+
+
+def _unauthorized(message):
+    """Same status, headers and body as check_token() in appORM.py"""
+    body = json.dumps({"message": message, "status": "unauthorized"}).encode()
+    headers = [
+        ("Content-Type", "application/json"),
+        ("Content-Length", str(len(body))),
+        ("Access-Control-Allow-Origin", ALLOW_ORIGIN),
+    ]
+    return headers, body
+
+
+# Username of an accepted token, so check_token() does not look it up again
+USER_KEY = "film_api.user"
+
+MISSING_TOKEN = _unauthorized("Missing or invalid token")
+INVALID_TOKEN = _unauthorized("Invalid or expired token")
+
+
+class EdgeMiddleware:
+    """Answer requests that need no application code without entering Flask.
+
+    - A CORS preflight (OPTIONS with Access-Control-Request-Method) gets a 204
+      with Access-Control-Max-Age, so the browser skips it for the next calls.
+    - With `sessions`, a request outside `public_paths` without a
+      "Bearer <token>" header, or with a token not in sessions, gets the 401
+      check_token() would have sent. For the others, the username is left in
+      environ[USER_KEY]; check_token() still runs to rate limit them.
+    """
+
+    def __init__(self, app, sessions=None, public_paths=()):
+        self.app = app
+        self.sessions = sessions
+        self.public_paths = frozenset(public_paths)
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        if method == "OPTIONS" and "HTTP_ACCESS_CONTROL_REQUEST_METHOD" in environ:
+            # A 204 has no body and must not carry Content-Length (RFC 9110, 8.6)
+            start_response("204 No Content", PREFLIGHT_HEADERS)
+            return []
+
+        if self.sessions is not None and method != "OPTIONS" and environ.get("PATH_INFO") not in self.public_paths:
+            rejected = self._check_token(environ)
+            if rejected is not None:
+                headers, body = rejected
+                start_response("401 Unauthorized", list(headers))
+                return [body]
+
+        return self.app(environ, start_response)
+
+    def _check_token(self, environ):
+        auth = environ.get("HTTP_AUTHORIZATION")
+        if not auth or not auth.startswith("Bearer "):
+            return MISSING_TOKEN
+        username = self.sessions.get(auth.split(" ")[1])
+        if username is None:
+            return INVALID_TOKEN
+        environ[USER_KEY] = username
+        return None
+
+
+def init_edge(app, sessions=None, public_paths=()):
+    """Put EdgeMiddleware in front of the Flask dispatch of app (no-op when disabled)"""
+    if ENABLED:
+        app.wsgi_app = EdgeMiddleware(app.wsgi_app, sessions, public_paths)
@@ -0,0 +1,193 @@
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, text
+
+
+# --------------------------------------------------
+# Configuration
+# --------------------------------------------------
+CHANNEL = "entity_changed"
+MAX_ENTRIES = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "1") == "1"
+# With read replicas an entry can be refilled from a replica that has not
+# replayed the change yet, so entries are dropped a second time after this delay
+REPLICA_LAG_SECONDS = float(os.getenv("ENTITY_CACHE_REPLICA_LAG", "2"))
+
+# Column identifying the cached entity in each table
+CACHE_KEYS = {
+    "director": "id",
+    "film": "id",
+    "utilisateurs": "id",
+    "user_profile": "user_id",
+}
+
+TRIGGER_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_entity_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME || ':' || (to_jsonb(OLD) ->> TG_ARGV[0]));
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME || ':' || (to_jsonb(NEW) ->> TG_ARGV[0]));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def install_triggers(conn):
+    """Create the NOTIFY triggers (Postgres only, idempotent)"""
+    conn.execute(text(TRIGGER_FUNCTION_SQL))
+    for table, column in CACHE_KEYS.items():
+        conn.execute(text(
+            f"CREATE OR REPLACE TRIGGER {table}_notify_change "
+            f"AFTER UPDATE OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION notify_entity_change('{column}')"
+        ))
+
+
+# --------------------------------------------------
+# Cache
+# --------------------------------------------------
+class EntityCache:
+    """Size-bounded LRU of entity dicts, invalidated by Postgres notifications.
+
+    The cache is only used while this process is LISTENing: a lost listener
+    connection clears it and lookups go straight to the database until the
+    listener is back, so entries are never served without invalidation.
+    """
+
+    def __init__(self, maxsize=MAX_ENTRIES):
+        self.maxsize = maxsize
+        self.replicas = False
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load racing with a change is not stored
+        self._generation = 0
+        self._listening = False
+        self._listener_pid = None
+        self._delayed = []
+
+    # ---- lookups
+    def get_or_load(self, engine, table, key, loader):
+        if not self._ensure_listener(engine):
+            return loader()
+
+        # Same key as _drop(), or a notification would miss a "12" entry
+        key = _as_int(key)
+
+        with self._lock:
+            if (table, key) in self._entries:
+                self._entries.move_to_end((table, key))
+                return self._entries[(table, key)]
+            generation = self._generation
+
+        value = loader()
+        # Missing rows are not cached, they may be created at any time
+        if value is not None:
+            with self._lock:
+                if self._listening and generation == self._generation:
+                    self._entries[(table, key)] = value
+                    if len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return value
+
+    # ---- invalidation
+    def _drop(self, table, key):
+        self._generation += 1
+        self._entries.pop((table, _as_int(key)), None)
+        if table == "director":
+            # Films embed their director
+            for entry in [k for k in self._entries if k[0] == "film"]:
+                del self._entries[entry]
+
+    def invalidate(self, table, key):
+        with self._lock:
+            self._drop(table, key)
+            if self.replicas and REPLICA_LAG_SECONDS:
+                self._delayed.append((time.monotonic() + REPLICA_LAG_SECONDS, table, key))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    # ---- LISTEN thread, started lazily so it always belongs to the worker
+    def _ensure_listener(self, engine):
+        if not ENABLED or engine.dialect.name != "postgresql":
+            return False
+        if self._listener_pid != os.getpid():
+            with self._lock:
+                if self._listener_pid != os.getpid():
+                    self._listener_pid = os.getpid()
+                    self._listening = False
+                    self._entries.clear()
+                    self._delayed = []
+                    thread = threading.Thread(target=self._listen, args=(engine,), daemon=True)
+                    thread.start()
+        return self._listening
+
+    def _listen(self, engine):
+        pid = os.getpid()
+        while self._listener_pid == pid:
+            try:
+                # A connection of its own, outside the pool
+                conn = engine.raw_connection()
+                dbapi_conn = conn.dbapi_connection
+                conn.detach()
+                dbapi_conn.autocommit = True
+                dbapi_conn.cursor().execute(f"LISTEN {CHANNEL}")
+                # Anything cached before LISTEN took effect may have missed a change
+                self.clear()
+                self._listening = True
+
+                while self._listener_pid == pid:
+                    if select.select([dbapi_conn], [], [], 1.0)[0]:
+                        dbapi_conn.poll()
+                        while dbapi_conn.notifies:
+                            table, _, key = dbapi_conn.notifies.pop(0).payload.partition(":")
+                            self.invalidate(table, key)
+                    self._run_delayed()
+            except Exception as e:
+                print(f"⚠️ Entity cache listener lost its connection: {e}")
+            self._listening = False
+            self.clear()
+            time.sleep(1)
+
+    def _run_delayed(self):
+        now = time.monotonic()
+        with self._lock:
+            for _, table, key in [item for item in self._delayed if item[0] <= now]:
+                self._drop(table, key)
+            self._delayed = [item for item in self._delayed if item[0] > now]
+
+    # ---- local invalidation, so a worker sees its own writes immediately
+    def watch_sessions(self, session_class):
+        @event.listens_for(session_class, "after_flush")
+        def collect_changes(session, flush_context):
+            changed = session.info.setdefault("entity_cache_changes", set())
+            for obj in list(session.dirty) + list(session.deleted):
+                table = getattr(obj, "__tablename__", None)
+                if table in CACHE_KEYS:
+                    changed.add((table, getattr(obj, CACHE_KEYS[table])))
+
+        @event.listens_for(session_class, "after_commit")
+        def invalidate_changes(session):
+            for table, key in session.info.pop("entity_cache_changes", ()):
+                self.invalidate(table, key)
+
+        @event.listens_for(session_class, "after_rollback")
+        def forget_changes(session):
+            session.info.pop("entity_cache_changes", None)
+
+
+def _as_int(key):
+    try:
+        return int(key)
+    except (TypeError, ValueError):
+        return key
@@ -0,0 +1,45 @@
+import os
+
+# --------------------------------------------------
+# Gunicorn configuration, every setting can be overridden from the environment
+# --------------------------------------------------
+wsgi_app = os.getenv("GUNICORN_APP", "app:create_app()")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# sync, gthread or gevent
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# Build the app once in the master and share it copy-on-write with the workers
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections"""
+    if worker_class == "gevent":
+        # psycopg2 blocks the whole worker unless it yields to the gevent hub
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen is not installed, psycopg2 calls will block gevent workers")
+
+    if not preload_app:
+        return
+
+    # Connections opened in the master (if any) must not be shared with the
+    # child; close=False leaves the sockets to the master and drops the pool.
+    from flask_sqlalchemy import SQLAlchemy
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for extension in app.extensions.values():
+            if isinstance(extension, SQLAlchemy):
+                for engine in extension.engines.values():
+                    engine.dispose(close=False)
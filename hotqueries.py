@@ -0,0 +1,97 @@
+from sqlalchemy import text
+
+
+# --------------------------------------------------
+# Hot primary-key lookups
+# --------------------------------------------------
+# Statements run on nearly every request. {0}, {1} are the parameters.
+# On Postgres each one is PREPAREd once per pooled connection and then run
+# with EXECUTE, so the server skips parsing and planning; on other backends
+# the pre-built text() constructs still skip building a query per call.
+HOT_STATEMENTS = {
+    "film_by_id": (
+        "SELECT f.id, f.titre, f.annee, f.duree, f.id_director, d.name, d.surname "
+        "FROM film f LEFT JOIN director d ON d.id = f.id_director WHERE f.id = {0}"
+    ),
+    "user_by_id": "SELECT id, username, mail, langue FROM utilisateurs WHERE id = {0}",
+    "profile_by_user": (
+        "SELECT id, user_id, bio, avatar_url, created_at, updated_at "
+        "FROM user_profile WHERE user_id = {0}"
+    ),
+    "director_by_id": "SELECT id, name, surname FROM director WHERE id = {0}",
+}
+
+PARAM_COUNTS = {name: sql.count("{") for name, sql in HOT_STATEMENTS.items()}
+PREPARE = {
+    name: text(f"PREPARE hot_{name} AS " + sql.format(*(f"${i + 1}" for i in range(PARAM_COUNTS[name]))))
+    for name, sql in HOT_STATEMENTS.items()
+}
+EXECUTE = {
+    name: text(f"EXECUTE hot_{name} (" + ", ".join(f":p{i}" for i in range(PARAM_COUNTS[name])) + ")")
+    for name in HOT_STATEMENTS
+}
+PLAIN = {
+    name: text(sql.format(*(f":p{i}" for i in range(PARAM_COUNTS[name]))))
+    for name, sql in HOT_STATEMENTS.items()
+}
+
+
+def fetch_one(session, name, *params):
+    """Run a hot statement and return its first row as a mapping (or None)"""
+    conn = session.connection()
+    args = {f"p{i}": value for i, value in enumerate(params)}
+
+    if conn.dialect.name != "postgresql":
+        return conn.execute(PLAIN[name], args).mappings().first()
+
+    # conn.info lives as long as the DBAPI connection, like the prepared statement
+    prepared = conn.info.setdefault("hot_prepared", set())
+    if name not in prepared:
+        conn.execute(PREPARE[name])
+        prepared.add(name)
+    return conn.execute(EXECUTE[name], args).mappings().first()
+
+
+def _iso(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+# --------------------------------------------------
+# Rows shaped like the models' to_dict()
+# --------------------------------------------------
+def find_film(session, film_id):
+    row = fetch_one(session, "film_by_id", film_id)
+    if row is None:
+        return None
+    return {
+        "id": row["id"],
+        "titre": row["titre"],
+        "annee": row["annee"],
+        "duree": row["duree"],
+        "id_director": row["id_director"],
+        "director": {
+            "id": row["id_director"],
+            "name": row["name"],
+            "surname": row["surname"],
+        } if row["id_director"] is not None and row["name"] is not None else None,
+    }
+
+
+def find_director(session, director_id):
+    row = fetch_one(session, "director_by_id", director_id)
+    return dict(row) if row is not None else None
+
+
+def find_user(session, user_id):
+    row = fetch_one(session, "user_by_id", user_id)
+    return dict(row) if row is not None else None
+
+
+def find_profile(session, user_id):
+    row = fetch_one(session, "profile_by_user", user_id)
+    if row is None:
+        return None
+    profile = dict(row)
+    profile["created_at"] = _iso(profile["created_at"])
+    profile["updated_at"] = _iso(profile["updated_at"])
+    return profile
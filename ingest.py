@@ -0,0 +1,373 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+import changes
+
+
+# --------------------------------------------------
+# Configuration
+# --------------------------------------------------
+MODE = os.getenv("MARKS_INGEST_MODE", "direct")  # direct or group
+QUEUE_SIZE = int(os.getenv("MARKS_INGEST_QUEUE_SIZE", "50000"))
+BATCH_SIZE = int(os.getenv("MARKS_INGEST_BATCH_SIZE", "2000"))
+FLUSH_INTERVAL = float(os.getenv("MARKS_INGEST_FLUSH_INTERVAL", "0.2"))
+# memory: lost if the worker dies before the flush
+# journal: appended to a per-worker file first, survives a worker crash
+# fsync: same, and fsync'd before answering, survives a power loss
+DURABILITY = os.getenv("MARKS_INGEST_DURABILITY", "journal")
+JOURNAL_DIR = os.getenv("MARKS_INGEST_JOURNAL_DIR", "ingest-journal")
+# Attempts of a batch while the database is unreachable, before it goes back
+# to the queue and the flusher waits RETRY_DELAY seconds
+WRITE_RETRIES = int(os.getenv("MARKS_INGEST_WRITE_RETRIES", "3"))
+RETRY_DELAY = float(os.getenv("MARKS_INGEST_RETRY_DELAY", "1"))
+
+# Each process writes append-only journal segments marks-<id>-<seq>.jsonl
+# under a unique id (pid and a random suffix, pids come back after a
+# container restart) and holds an flock on marks-<id>.lock while it lives.
+# A lock file nobody holds belongs to a dead process: its segments are
+# replayed, in order, by the next worker that starts.
+
+
+# The partitioned Postgres table has no unique key on (id_film, id_user) for
+# ON CONFLICT, so pairs are locked (in a fixed order, against deadlocks) and
+# written with an UPDATE of the existing rows and an INSERT of the others.
+PG_LOCK_PAIRS = text(
+    "SELECT pg_advisory_xact_lock(f, u) FROM unnest(:films, :users) AS t(f, u) ORDER BY f, u"
+)
+PG_UPDATE_MARKS = text(
+    "UPDATE mark m SET mark = v.mark, updated_at = (now() AT TIME ZONE 'utc') "
+    "FROM unnest(:films, :users, :marks) AS v(id_film, id_user, mark) "
+    "WHERE m.id_film = v.id_film AND m.id_user = v.id_user "
+    "RETURNING m.id, m.id_film, m.id_user, m.mark, m.created_at, m.updated_at"
+)
+PG_INSERT_MARKS = text(
+    "INSERT INTO mark (id_film, id_user, mark, created_at, updated_at) "
+    "SELECT v.id_film, v.id_user, v.mark, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc' "
+    "FROM unnest(:films, :users, :marks) AS v(id_film, id_user, mark) "
+    "WHERE NOT EXISTS (SELECT 1 FROM mark m WHERE m.id_film = v.id_film AND m.id_user = v.id_user) "
+    "RETURNING id, id_film, id_user, mark, created_at, updated_at"
+)
+
+
+def upsert_marks(session, table, rows, change_table=None):
+    """Insert or update a batch of marks in one round of statements.
+
+    With change_table, the written marks are also added to the change feed,
+    which the ORM hook of changes.py does not see for Core statements.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        params = {
+            "films": [row["id_film"] for row in rows],
+            "users": [row["id_user"] for row in rows],
+            "marks": [row["mark"] for row in rows],
+        }
+        session.execute(PG_LOCK_PAIRS, params)
+        written = session.execute(PG_UPDATE_MARKS, params).mappings().all()
+        written += session.execute(PG_INSERT_MARKS, params).mappings().all()
+    else:
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id_film, table.c.id_user],
+            set_={"mark": stmt.excluded.mark, "updated_at": datetime.utcnow()},
+        )
+        written = session.execute(stmt.returning(*table.c)).mappings().all()
+
+    if change_table is not None:
+        changes.record(session.connection(), change_table, [
+            ("mark", row["id"], "upsert", {
+                "id": row["id"],
+                "id_film": row["id_film"],
+                "id_user": row["id_user"],
+                "mark": row["mark"],
+                "created_at": row["created_at"].isoformat(),
+                "updated_at": row["updated_at"].isoformat(),
+            })
+            for row in written
+        ])
+
+
+class MarkIngestor:
+    """Bounded queue of validated marks flushed in batches by a background thread.
+
+    Duplicate (film, user) pairs inside a batch collapse to the last mark
+    received, so each batch is a single upsert and a single commit.
+    """
+
+    def __init__(self, db, table, change_table=None):
+        self.db = db
+        self.table = table
+        self.change_table = change_table
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._pid = None
+        self._app = None
+        self._journal_id = None
+        self._lock_file = None
+        self._journal = None
+        # Sequence number of the open segment and the lines written to it;
+        # the segments below _kept are deleted, every entry in them is committed
+        self._segment = 0
+        self._segment_lines = 0
+        self._kept = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.last_batch = 0
+        self.last_flush_lag = 0.0
+        self.last_error = None
+
+    # ---- producer side
+    def submit(self, app, id_film, id_user, mark):
+        """Queue a mark; False when the queue is full"""
+        self._ensure_started(app)
+        with self._cond:
+            if len(self._queue) >= QUEUE_SIZE:
+                return False
+            if self._journal is not None:
+                self._journal.write(json.dumps([time.time(), id_film, id_user, mark]) + "\n")
+                self._journal.flush()
+                if DURABILITY == "fsync":
+                    os.fsync(self._journal.fileno())
+                self._segment_lines += 1
+            self._queue.append((time.monotonic(), self._segment, id_film, id_user, mark))
+            if len(self._queue) >= BATCH_SIZE:
+                self._cond.notify()
+        return True
+
+    def stats(self):
+        with self._cond:
+            oldest = self._queue[0][0] if self._queue else None
+            queued = len(self._queue)
+        return {
+            "mode": MODE,
+            "durability": DURABILITY,
+            "queued": queued,
+            "oldest_queued_ms": round((time.monotonic() - oldest) * 1000, 1) if oldest else 0,
+            "last_flush_lag_ms": round(self.last_flush_lag * 1000, 1),
+            "last_batch_size": self.last_batch,
+            "flushed_total": self.flushed,
+            "dropped_total": self.dropped,
+            "last_error": self.last_error,
+        }
+
+    # ---- flusher thread, started lazily so it belongs to the worker process
+    def _ensure_started(self, app):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            # Files inherited through fork() stay with the parent's journal
+            for f in (self._journal, self._lock_file):
+                if f is not None:
+                    f.close()
+            self._journal = self._lock_file = None
+            self._pid = os.getpid()
+            self._app = app
+            self._queue.clear()
+            if DURABILITY in ("journal", "fsync"):
+                os.makedirs(JOURNAL_DIR, exist_ok=True)
+                # A replaying worker may take and delete a lock file between
+                # its creation and our flock; start over under a new id then
+                while self._lock_file is None:
+                    self._journal_id = f"{os.getpid()}.{uuid.uuid4().hex[:12]}"
+                    self._lock_file = _lock_journal(_lock_path(self._journal_id), fcntl.LOCK_EX)
+                self._segment = self._kept = 0
+                self._open_segment()
+            threading.Thread(target=self._run, daemon=True).start()
+            atexit.register(self.flush_all)
+
+    def _open_segment(self):
+        self._journal = open(_segment_path(self._journal_id, self._segment), "a")
+        self._segment_lines = 0
+
+    def _run(self):
+        # Older marks of stopped workers go first, or they would overwrite ours
+        while self._journal is not None and self._pid == os.getpid():
+            try:
+                with self._app.app_context():
+                    self._replay_orphan_journals()
+                break
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Replay of stopped workers' marks failed, retrying in {RETRY_DELAY:g}s: {e}")
+                time.sleep(RETRY_DELAY)
+        while self._pid == os.getpid():
+            with self._cond:
+                if len(self._queue) < BATCH_SIZE:
+                    self._cond.wait(FLUSH_INTERVAL)
+            if not self.flush_once():
+                time.sleep(RETRY_DELAY)
+
+    def _take_batch(self):
+        with self._cond:
+            batch = [self._queue.popleft() for _ in range(min(BATCH_SIZE, len(self._queue)))]
+            if batch and self._journal is not None and self._segment_lines:
+                # Marks accepted from now on go to the next segment
+                self._journal.close()
+                self._segment += 1
+                self._open_segment()
+        return batch
+
+    def _release_segments(self):
+        """Delete the segments whose marks are all committed"""
+        with self._cond:
+            if self._journal is None:
+                return
+            keep = self._queue[0][1] if self._queue else self._segment
+            done, self._kept = range(self._kept, keep), max(self._kept, keep)
+        for seq in done:
+            try:
+                os.remove(_segment_path(self._journal_id, seq))
+            except FileNotFoundError:
+                pass
+
+    def flush_once(self):
+        """Write one batch; False when it failed and went back to the queue"""
+        batch = self._take_batch()
+        if not batch:
+            return True
+
+        # Last write wins for a (film, user) pair
+        latest = {}
+        for _, _, id_film, id_user, mark in batch:
+            latest[(id_film, id_user)] = mark
+        rows = [{"id_film": f, "id_user": u, "mark": m} for (f, u), m in latest.items()]
+
+        try:
+            with self._app.app_context():
+                self._write(rows)
+        except Exception as e:
+            # Back in front of the queue, in order; its segments stay on disk
+            with self._cond:
+                self._queue.extendleft(reversed(batch))
+            self.last_error = str(e)
+            print(f"❌ Mark batch of {len(rows)} not written, retrying in {RETRY_DELAY:g}s: {e}")
+            return False
+
+        self._release_segments()
+        self.flushed += len(rows)
+        self.last_batch = len(rows)
+        self.last_flush_lag = time.monotonic() - batch[0][0]
+        return True
+
+    def _write(self, rows):
+        """Upsert and commit rows; raises once the database stayed unreachable WRITE_RETRIES times"""
+        session = self.db.session
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                upsert_marks(session, self.table, rows, self.change_table)
+                session.commit()
+                self.last_error = None
+                return
+            except OperationalError as e:
+                # Connection lost or server unavailable
+                session.rollback()
+                self.last_error = str(e)
+                if attempt == WRITE_RETRIES:
+                    raise
+                time.sleep(RETRY_DELAY * attempt)
+            except DBAPIError:
+                # A row the database refuses (film or user deleted after
+                # validation): write row by row and drop the bad ones
+                session.rollback()
+                break
+
+        for row in rows:
+            try:
+                with session.begin_nested():
+                    upsert_marks(session, self.table, [row], self.change_table)
+            except OperationalError:
+                session.rollback()
+                raise
+            except DBAPIError:
+                self.dropped += 1
+        session.commit()
+
+    def flush_all(self):
+        if self._pid != os.getpid():
+            return
+        while self._queue:
+            if not self.flush_once():
+                # Left in the journal, replayed by the next worker
+                return
+        with self._cond:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                os.remove(_segment_path(self._journal_id, self._segment))
+                os.remove(_lock_path(self._journal_id))
+
+    def _replay_orphan_journals(self):
+        """Write the journals of workers that died with marks still queued.
+
+        Every line carries the time its mark was accepted, so the last mark of
+        a pair wins across segments and across dead workers. The files are
+        kept when the write fails.
+        """
+        orphans = []
+        try:
+            for lock_path in glob.glob(os.path.join(JOURNAL_DIR, "marks-*.lock")):
+                journal_id = os.path.basename(lock_path)[len("marks-"):-len(".lock")]
+                if journal_id == self._journal_id:
+                    continue
+                lock = _lock_journal(lock_path, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if lock is None:
+                    continue  # alive, or being replayed by another worker
+                orphans.append((lock, lock_path, glob.glob(os.path.join(JOURNAL_DIR, f"marks-{journal_id}-*.jsonl"))))
+
+            latest = {}
+            for _, _, segments in orphans:
+                for path in segments:
+                    with open(path) as f:
+                        for line in f:
+                            try:
+                                at, id_film, id_user, mark = json.loads(line)
+                            except ValueError:
+                                continue  # torn last line
+                            if at >= latest.get((id_film, id_user), (0, None))[0]:
+                                latest[(id_film, id_user)] = (at, mark)
+            if latest:
+                self._write([{"id_film": f, "id_user": u, "mark": m} for (f, u), (_, m) in latest.items()])
+                print(f"♻️ Replayed {len(latest)} marks of {len(orphans)} stopped worker(s)")
+
+            for _, lock_path, segments in orphans:
+                for path in segments:
+                    os.remove(path)
+                os.remove(lock_path)
+        finally:
+            for lock, _, _ in orphans:
+                lock.close()
+
+
+def _lock_journal(path, operation):
+    """Open and flock `path`; None when the lock is held (LOCK_NB) or the file
+    was deleted or replaced before the lock was granted"""
+    lock = open(path, "a")
+    try:
+        fcntl.flock(lock, operation)
+        if os.fstat(lock.fileno()).st_ino == os.stat(path).st_ino:
+            return lock
+    except (BlockingIOError, FileNotFoundError):
+        pass
+    lock.close()
+    return None
+
+
+def _lock_path(journal_id):
+    return os.path.join(JOURNAL_DIR, f"marks-{journal_id}.lock")
+
+
+def _segment_path(journal_id, seq):
+    return os.path.join(JOURNAL_DIR, f"marks-{journal_id}-{seq:08d}.jsonl")
@@ -0,0 +1,63 @@
+from sqlalchemy import inspect, text
+
+from partitions import ensure_mark_partitions, is_partitioned
+
+
+# --------------------------------------------------
+# Schema upgrades db.create_all() cannot do on existing tables
+# --------------------------------------------------
+def upgrade_mark_table(conn, table):
+    """Bring a mark table created before timestamps and partitioning up to date.
+
+    Idempotent: run by init_db on every worker start, it does nothing on an
+    up-to-date table. `table` is Mark.__table__. Existing marks get the
+    upgrade time as created_at and updated_at. Returns the steps done.
+    """
+    if not inspect(conn).has_table("mark"):
+        return []
+    postgres = conn.dialect.name == "postgresql"
+    columns = {column["name"] for column in inspect(conn).get_columns("mark")}
+    steps = []
+
+    for name in ("created_at", "updated_at"):
+        if name in columns:
+            continue
+        if postgres:
+            conn.execute(text(
+                f"ALTER TABLE mark ADD COLUMN {name} TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')"
+            ))
+            conn.execute(text(f"ALTER TABLE mark ALTER COLUMN {name} DROP DEFAULT"))
+        else:
+            # SQLite only adds columns with a constant default
+            conn.execute(text(f"ALTER TABLE mark ADD COLUMN {name} DATETIME"))
+            conn.execute(text(f"UPDATE mark SET {name} = CURRENT_TIMESTAMP"))
+        steps.append(f"added mark.{name}")
+
+    if postgres and not is_partitioned(conn):
+        # The view would follow the renamed table; install_director_stats recreates it
+        conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS director_stats"))
+        conn.execute(text("ALTER TABLE mark RENAME TO mark_unpartitioned"))
+        table.create(conn)
+        ensure_mark_partitions(conn)
+        conn.execute(text(
+            "INSERT INTO mark (id, id_film, id_user, mark, created_at, updated_at) "
+            "SELECT id, id_film, id_user, mark, created_at, updated_at FROM mark_unpartitioned"
+        ))
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('mark', 'id'), COALESCE(max(id), 0) + 1, false) FROM mark"
+        ))
+        conn.execute(text("DROP TABLE mark_unpartitioned"))
+        steps.append("partitioned mark by month")
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_mark_created_at ON mark (created_at)"))
+    return steps
+
+
+if __name__ == "__main__":
+    # Upgrade without starting worker.py, e.g. before rolling out the API
+    from appORM import Mark, create_app, db
+
+    app = create_app()
+    with app.app_context(), db.engine.begin() as conn:
+        for step in upgrade_mark_table(conn, Mark.__table__) or ["nothing to upgrade"]:
+            print(f"🛠️ {step}")
@@ -0,0 +1,103 @@
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+
+# --------------------------------------------------
+# Monthly range partitions of the mark table (Postgres only)
+# --------------------------------------------------
+MONTHS_AHEAD = int(os.getenv("MARK_PARTITIONS_AHEAD", "3"))
+# 0 keeps every partition attached
+RETENTION_MONTHS = int(os.getenv("MARK_RETENTION_MONTHS", "0"))
+
+PARTITION_NAME = re.compile(r"^mark_y(\d{4})m(\d{2})$")
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"mark_y{month.year:04d}m{month.month:02d}"
+
+
+def not_postgres(ddl, target, bind, **kw):
+    """ddl_if() callable: keep a constraint on every backend except Postgres"""
+    return kw["dialect"].name != "postgresql"
+
+
+def is_partitioned(conn):
+    """True when mark is a partitioned table (create_all does not convert an existing one)"""
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('mark'))"
+    )).scalar()
+
+
+def ensure_mark_partitions(conn, today=None, months_ahead=MONTHS_AHEAD):
+    """Create the partitions from last month to `months_ahead` months from now.
+
+    Rows outside every range land in mark_default. A range cannot be attached
+    while default holds rows inside it, so a missing month is created as a
+    plain table, the matching default rows are moved into it, and it is then
+    attached. Returns the names of the partitions created, None when mark is
+    not partitioned.
+    """
+    if not is_partitioned(conn):
+        return None
+    # init_db and worker.py may both run this
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('mark_partitions'))"))
+    conn.execute(text("CREATE TABLE IF NOT EXISTS mark_default PARTITION OF mark DEFAULT"))
+    today = today or date.today()
+    created = []
+    for offset in range(-1, months_ahead + 1):
+        start = add_months(today.replace(day=1), offset)
+        end = add_months(start, 1)
+        name = partition_name(start)
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+            continue
+        bounds = {"start": start, "end": end}
+        conn.execute(text(f"CREATE TABLE {name} (LIKE mark INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM mark_default WHERE created_at >= :start AND created_at < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), bounds)
+        conn.execute(text(
+            f"ALTER TABLE mark ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        created.append(name)
+    return created
+
+
+def attached_partitions(conn):
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'mark'"
+    ))
+    return [row[0] for row in rows]
+
+
+def detach_old_mark_partitions(engine, today=None, retention_months=RETENTION_MONTHS):
+    """Detach the monthly partitions older than the retention window.
+
+    DETACH ... CONCURRENTLY only takes a weak lock on mark but cannot run inside
+    a transaction, hence the autocommit connection. Detached tables are kept
+    (as plain tables) for archiving; their ratings no longer show in the API.
+    """
+    if not retention_months:
+        return []
+
+    cutoff = add_months((today or date.today()).replace(day=1), -retention_months)
+    detached = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in attached_partitions(conn):
+            match = PARTITION_NAME.match(name)
+            if match and date(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+                conn.execute(text(f"ALTER TABLE mark DETACH PARTITION {name} CONCURRENTLY"))
+                detached.append(name)
+    return detached
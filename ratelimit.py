@@ -0,0 +1,143 @@
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+# --------------------------------------------------
+# Token bucket rate limiter shared between gunicorn workers
+# --------------------------------------------------
+DEFAULT_RATE_LIMITS = "default=120/60,login=10/60,get_marks=30/60,get_films=60/60"
+# How often a worker deletes the buckets nobody used for a full refill period
+PRUNE_SECONDS = float(os.getenv("RATE_LIMIT_PRUNE_SECONDS", "300"))
+# How long a request waits for the counter file before it is let through unlimited
+BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_BUSY_TIMEOUT_MS", "50"))
+
+
+def parse_quotas(spec):
+    """Parse "endpoint=capacity/seconds,..." into {endpoint: (capacity, seconds)}
+
+    Raises ValueError naming the first malformed entry.
+    """
+    quotas = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        endpoint, _, quota = item.partition("=")
+        capacity, _, period = quota.partition("/")
+        try:
+            capacity, period = int(capacity), float(period or 60)
+        except ValueError:
+            capacity = period = 0
+        if not endpoint.strip() or capacity <= 0 or period <= 0:
+            raise ValueError(f"invalid rate limit {item!r}, expected endpoint=capacity/seconds")
+        quotas[endpoint.strip()] = (capacity, period)
+    return quotas
+
+
+class TokenBucketLimiter:
+    """Token buckets stored in a small SQLite file so every worker sees the same counters.
+
+    Each (endpoint, client) pair owns a bucket of `capacity` tokens refilled
+    continuously over `period` seconds. Endpoints without an explicit quota
+    use the "default" entry.
+    """
+
+    def __init__(self, path, quotas):
+        self.path = path
+        self.quotas = quotas
+        # Past the longest period every bucket is full again, the same as no row
+        self.idle_seconds = max((period for _, period in quotas.values()), default=0)
+        self._local = threading.local()
+        self._pruned = 0.0
+
+    def _connection(self):
+        # Connections are opened lazily so they are never inherited across fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_bucket_updated ON bucket (updated)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def quota_for(self, endpoint):
+        return self.quotas.get(endpoint) or self.quotas.get("default")
+
+    def consume(self, endpoint, client_key):
+        """Take one token; return (allowed, retry_after_seconds).
+
+        Fails open: when the counter file is locked past BUSY_TIMEOUT_MS or
+        unusable, the request is allowed rather than answered with a 500.
+        """
+        quota = self.quota_for(endpoint)
+        if quota is None:
+            return True, 0
+        try:
+            return self._take(endpoint, client_key, *quota)
+        except sqlite3.Error as e:
+            print(f"⚠️ Rate limiter unavailable, request allowed: {e}")
+            return True, 0
+
+    def _take(self, endpoint, client_key, capacity, period):
+        rate = capacity / period
+        key = f"{endpoint}:{client_key}"
+        now = time.time()
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                tokens = float(capacity)
+            else:
+                tokens = min(float(capacity), row[0] + (now - row[1]) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if now - self._pruned >= PRUNE_SECONDS:
+            self._pruned = now
+            self.prune(now)
+
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil((1 - tokens) / rate))
+
+    def prune(self, now=None):
+        """Delete the buckets idle for longer than a full refill, returns the number deleted"""
+        cutoff = (now or time.time()) - self.idle_seconds
+        return self._connection().execute("DELETE FROM bucket WHERE updated < ?", (cutoff,)).rowcount
+
+
+def limiter_from_env():
+    """Build the limiter from RATE_LIMIT_* environment variables (None when disabled)"""
+    if os.getenv("RATE_LIMIT_ENABLED", "1") == "0":
+        return None
+    path = os.getenv("RATE_LIMIT_DB", os.path.join(tempfile.gettempdir(), "film_api_ratelimit.sqlite3"))
+    try:
+        quotas = parse_quotas(os.getenv("RATE_LIMITS", DEFAULT_RATE_LIMITS))
+    except ValueError as e:
+        # Keep the workers up with the documented quotas rather than none
+        print(f"⚠️ RATE_LIMITS: {e}; using {DEFAULT_RATE_LIMITS}")
+        quotas = parse_quotas(DEFAULT_RATE_LIMITS)
+    return TokenBucketLimiter(path, quotas)
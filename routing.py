@@ -0,0 +1,202 @@
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+
+# --------------------------------------------------
+# Read replica routing
+# --------------------------------------------------
+READ_METHODS = {"GET", "HEAD"}
+
+# How long a client that just wrote keeps reading from the primary
+PIN_SECONDS = float(os.getenv("DB_PRIMARY_PIN_SECONDS", "5"))
+PIN_COOKIE = "primary_pin"
+# Pins shared by the workers, like the rate limit buckets (see ratelimit.py)
+PIN_DB = os.getenv("DB_PRIMARY_PIN_DB", os.path.join(tempfile.gettempdir(), "film_api_pins.sqlite3"))
+PIN_PRUNE_SECONDS = float(os.getenv("DB_PRIMARY_PIN_PRUNE_SECONDS", "60"))
+
+# How often a replica is probed, and how long a failed one stays out of rotation
+HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", "10"))
+
+
+def replica_binds():
+    """Build SQLALCHEMY_BINDS entries from the comma separated DB_REPLICA_URIS"""
+    uris = [uri.strip() for uri in os.getenv("DB_REPLICA_URIS", "").split(",") if uri.strip()]
+    return {f"replica_{i}": uri for i, uri in enumerate(uris)}
+
+
+class ReplicaSet:
+    """Round-robin over the replica engines that passed their last health check.
+
+    A background thread of each worker probes the replicas every
+    HEALTH_INTERVAL, so a dead replica never stalls a request. Until its
+    first probe answered, a replica is out of rotation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._healthy = {}
+        self._engines = {}
+        self._pid = None
+
+    @staticmethod
+    def _probe(engine):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def _watch(self, pid):
+        while self._pid == pid:
+            for key, engine in list(self._engines.items()):
+                self._healthy[key] = self._probe(engine)
+            time.sleep(HEALTH_INTERVAL)
+
+    def _start(self, engines):
+        """Start probing in this process (threads do not survive fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._engines = engines
+            self._healthy = {}
+            threading.Thread(target=self._watch, args=(self._pid,), name="replica-health", daemon=True).start()
+
+    def pick(self, engines):
+        keys = sorted(k for k in engines if k and k.startswith("replica_"))
+        if not keys:
+            return None, None
+        if self._pid != os.getpid():
+            self._start({key: engines[key] for key in keys})
+        start = next(self._counter)
+        for i in range(len(keys)):
+            key = keys[(start + i) % len(keys)]
+            if self._healthy.get(key):
+                return key, engines[key]
+        return None, None
+
+
+REPLICAS = ReplicaSet()
+
+class PinStore:
+    """Clients pinned to the primary, in a SQLite file every worker sees.
+
+    Bearer-token clients do not keep the cookie, and their next read can land
+    on any worker.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pruned = 0.0
+
+    def _connection(self):
+        # Opened lazily so it is never inherited across fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS pin (key TEXT PRIMARY KEY, expiry REAL NOT NULL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def is_pinned(self, key):
+        row = self._connection().execute("SELECT expiry FROM pin WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def pin(self, key, seconds):
+        now = time.time()
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO pin (key, expiry) VALUES (?, ?)", (key, now + seconds))
+        # Forget expired pins now and then so the table stays small
+        if now - self._pruned >= PIN_PRUNE_SECONDS:
+            self._pruned = now
+            conn.execute("DELETE FROM pin WHERE expiry <= ?", (now,))
+
+
+PINS = PinStore(PIN_DB)
+
+
+def _client_key():
+    return request.headers.get("Authorization") or request.remote_addr
+
+
+def _routing():
+    return current_app.extensions.get("routing", {})
+
+
+def _is_pinned():
+    if not _routing().get("pins"):
+        return False
+    if request.cookies.get(PIN_COOKIE):
+        return True
+    return PINS.is_pinned(_client_key())
+
+
+def may_read_stale():
+    """A read-only request of a client that has not written recently.
+
+    Such a read may be served from data lagging the primary by a few
+    seconds: a replica, or the catalogue snapshot.
+    """
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    if "read_stale" not in g:
+        g.read_stale = not _is_pinned()
+    return g.read_stale
+
+
+def use_replica():
+    """Send this request's reads to a replica (never without DB_REPLICA_URIS)"""
+    if not has_request_context() or not _routing().get("replicas"):
+        return False
+    return may_read_stale()
+
+
+class RoutingSession(Session):
+    """Send read-only requests to a healthy replica, everything else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and use_replica():
+            # Stick to one replica for the whole request
+            if "replica_key" not in g:
+                g.replica_key, _ = REPLICAS.pick(self._db.engines)
+            if g.replica_key is not None:
+                return self._db.engines[g.replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_routing(app, stale_reads=False):
+    """Pin clients to the primary for PIN_SECONDS after a successful write.
+
+    Pins only matter when some reads can lag the primary: with replicas, or
+    with stale_reads (another copy such as the catalogue snapshot). Without
+    either, nothing is pinned and reads never look a pin up.
+    """
+    replicas = any(key.startswith("replica_") for key in app.config.get("SQLALCHEMY_BINDS") or {})
+    app.extensions["routing"] = {"replicas": replicas, "pins": replicas or stale_reads}
+    if not app.extensions["routing"]["pins"]:
+        return
+
+    @app.after_request
+    def pin_writers(response):
+        # Requests running other requests (/batch) set g.wrote themselves
+        wrote = g.get("wrote")
+        if wrote is None:
+            wrote = request.method not in READ_METHODS and request.method != "OPTIONS" and response.status_code < 400
+        if wrote:
+            PINS.pin(_client_key(), PIN_SECONDS)
+            response.set_cookie(PIN_COOKIE, "1", max_age=int(PIN_SECONDS) or 1, httponly=True)
+        return response
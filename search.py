@@ -0,0 +1,137 @@
+import base64
+import json
+
+from sqlalchemy import text
+
+
+# --------------------------------------------------
+# Full-text search over film titles and profile bios (Postgres)
+# --------------------------------------------------
+# Text search configuration for each accepted `lang`, including the values
+# stored in utilisateurs.langue so a client can pass a user's language as is
+SEARCH_CONFIGS = {
+    "simple": "simple",
+    "fr": "french",
+    "français": "french",
+    "en": "english",
+    "anglais": "english",
+    "es": "spanish",
+    "espagnol": "spanish",
+}
+STEMMED_CONFIGS = ("french", "english", "spanish")
+
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+# Searchable column of each indexed table, and its weight in the ranking
+SEARCH_COLUMNS = {
+    "film": ("titre", "A"),
+    "user_profile": ("bio", "B"),
+}
+
+
+def vector_sql(column, weight):
+    """Unstemmed words plus the stems of every supported language.
+
+    A generated column can't look up the author's language in another table,
+    so each document is indexed once per configuration; a query stemmed with
+    any of them then matches through the same GIN index.
+    """
+    parts = [f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"]
+    parts += [
+        f"setweight(to_tsvector('{config}', coalesce({column}, '')), '{weight}')"
+        for config in STEMMED_CONFIGS
+    ]
+    return " || ".join(parts)
+
+
+def install_search(conn):
+    """Add the generated tsvector columns and their GIN indexes (Postgres only, idempotent)"""
+    for table, (column, weight) in SEARCH_COLUMNS.items():
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector_sql(column, weight)}) STORED"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (search_vector)"
+        ))
+
+
+# --------------------------------------------------
+# Cursors: the (rank, type, id) of the last hit of a page
+# --------------------------------------------------
+def encode_cursor(rank, kind, item_id):
+    raw = json.dumps([rank, kind, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(rank, type, id) or ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, kind, item_id = json.loads(raw)
+    except (TypeError, ValueError):
+        raise ValueError("invalid cursor")
+    if not isinstance(rank, (int, float)) or kind not in ("film", "profile") or not isinstance(item_id, int):
+        raise ValueError("invalid cursor")
+    return float(rank), kind, item_id
+
+
+# --------------------------------------------------
+# Queries
+# --------------------------------------------------
+PG_HITS = {
+    "film": (
+        "SELECT 'film' AS type, f.id AS id, ts_rank(f.search_vector, q.query)::float8 AS rank, "
+        "f.titre AS body FROM film f, q WHERE f.search_vector @@ q.query"
+    ),
+    "profile": (
+        "SELECT 'profile' AS type, p.user_id AS id, ts_rank(p.search_vector, q.query)::float8 AS rank, "
+        "p.bio AS body FROM user_profile p, q WHERE p.search_vector @@ q.query"
+    ),
+}
+
+
+def search_postgres(session, terms, config, kinds, limit, after=None):
+    """Ranked hits, best first; ts_headline only runs on the returned page"""
+    hits = " UNION ALL ".join(PG_HITS[kind] for kind in kinds)
+    params = {"config": config, "terms": terms, "limit": limit, "options": HEADLINE_OPTIONS}
+    where = ""
+    if after is not None:
+        where = "WHERE (rank, type, id) < (:rank, :type, :id)"
+        params.update(rank=after[0], type=after[1], id=after[2])
+
+    sql = (
+        "WITH q AS (SELECT websearch_to_tsquery(CAST(:config AS regconfig), :terms) AS query), "
+        f"hits AS ({hits}), "
+        f"page AS (SELECT * FROM hits {where} ORDER BY rank DESC, type DESC, id DESC LIMIT :limit) "
+        "SELECT page.type, page.id, page.rank, "
+        "ts_headline(CAST(:config AS regconfig), page.body, q.query, :options) AS headline "
+        "FROM page, q ORDER BY page.rank DESC, page.type DESC, page.id DESC"
+    )
+    return [dict(row) for row in session.execute(text(sql), params).mappings()]
+
+
+LIKE_HITS = {
+    "film": "SELECT 'film' AS type, id, 0.0 AS rank, titre AS body FROM film WHERE lower(titre) LIKE :pattern ESCAPE '\\'",
+    "profile": (
+        "SELECT 'profile' AS type, user_id AS id, 0.0 AS rank, bio AS body "
+        "FROM user_profile WHERE lower(bio) LIKE :pattern ESCAPE '\\'"
+    ),
+}
+
+
+def search_like(session, terms, kinds, limit, after=None):
+    """Unranked substring match for databases without full-text search"""
+    hits = " UNION ALL ".join(LIKE_HITS[kind] for kind in kinds)
+    pattern = "%" + terms.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    params = {"pattern": pattern, "limit": limit}
+    where = ""
+    if after is not None:
+        where = "WHERE type < :type OR (type = :type AND id < :id)"
+        params.update(type=after[1], id=after[2])
+
+    sql = f"SELECT * FROM ({hits}) AS hits {where} ORDER BY type DESC, id DESC LIMIT :limit"
+    rows = [dict(row) for row in session.execute(text(sql), params).mappings()]
+    for row in rows:
+        row["headline"] = row.pop("body")
+    return rows
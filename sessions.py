@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+# --------------------------------------------------
+# Login tokens shared between gunicorn workers
+# --------------------------------------------------
+# How long a token stays valid after login
+TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+# How often a worker deletes the expired tokens
+PRUNE_SECONDS = float(os.getenv("SESSION_PRUNE_SECONDS", "300"))
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore:
+    """Token -> username, in a small SQLite file so every worker accepts a token.
+
+    Used like the dict it replaces: `token in SESSIONS`, SESSIONS.get(token),
+    SESSIONS[token] = username and SESSIONS.pop(token, None). Only the SHA-256
+    of each token is stored, and tokens expire TTL_SECONDS after login.
+    """
+
+    def __init__(self, path, ttl=TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._pruned = 0.0
+
+    def _connection(self):
+        # Opened lazily so it is never inherited across fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # Private to the API's user; SQLite gives the -wal and -shm files the same mode
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Plain tokens of earlier versions
+            conn.execute("DROP TABLE IF EXISTS session")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login ("
+                "digest TEXT PRIMARY KEY, username TEXT NOT NULL, expiry REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_login_expiry ON login (expiry)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, token, default=None):
+        row = self._connection().execute(
+            "SELECT username FROM login WHERE digest = ? AND expiry > ?", (_digest(token), time.time())
+        ).fetchone()
+        return default if row is None else row[0]
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def __setitem__(self, token, username):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO login (digest, username, expiry) VALUES (?, ?, ?)",
+            (_digest(token), username, now + self.ttl),
+        )
+        # Forget expired tokens now and then so the table stays small
+        if now - self._pruned >= PRUNE_SECONDS:
+            self._pruned = now
+            conn.execute("DELETE FROM login WHERE expiry <= ?", (now,))
+
+    def pop(self, token, default=None):
+        username = self.get(token)
+        if username is None:
+            return default
+        self._connection().execute("DELETE FROM login WHERE digest = ?", (_digest(token),))
+        return username
+
+
+def sessions_from_env():
+    """Build the store at SESSION_DB (default: a directory of the current user in the temp directory)"""
+    default = os.path.join(tempfile.gettempdir(), f"film_api-{os.getuid()}", "sessions.sqlite3")
+    return SessionStore(os.getenv("SESSION_DB", default))
@@ -0,0 +1,251 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import text
+
+
+# --------------------------------------------------
+# Read-only catalogue snapshot shared by the workers through mmap
+# --------------------------------------------------
+ENABLED = os.getenv("CATALOGUE_SNAPSHOT_ENABLED", "1") == "1"
+PATH = os.getenv("CATALOGUE_SNAPSHOT_PATH", os.path.join("snapshot", "catalogue.bin"))
+# How often a worker checks whether the file was replaced
+CHECK_SECONDS = float(os.getenv("CATALOGUE_SNAPSHOT_CHECK_SECONDS", "1"))
+# worker.py touches <path>.fresh after each check; when neither file is
+# newer than this, nobody keeps the snapshot up to date any more and lookups
+# go back to the database
+MAX_AGE_SECONDS = float(os.getenv("CATALOGUE_SNAPSHOT_MAX_AGE_SECONDS", "30"))
+
+# File layout, little-endian, every section 4-byte aligned:
+#   header      magic, version, position, film count, director count, string table size
+#   films       id, annee, duree, id_director (-1: none), titre offset, titre length  (int32 columns)
+#   directors   id, name offset, name length, surname offset, surname length          (int32 columns)
+#   strings     UTF-8 text referenced by (offset, length)
+MAGIC = b"FCAT"
+VERSION = 1
+HEADER = struct.Struct("<4sIqIII")
+FILM_COLUMNS = ("id", "annee", "duree", "id_director", "titre_off", "titre_len")
+DIRECTOR_COLUMNS = ("id", "name_off", "name_len", "surname_off", "surname_len")
+NO_DIRECTOR = -1
+
+FILMS_SQL = text("SELECT id, titre, annee, duree, id_director FROM film ORDER BY id")
+DIRECTORS_SQL = text("SELECT id, name, surname FROM director ORDER BY id")
+
+
+# --------------------------------------------------
+# Builder
+# --------------------------------------------------
+class _Strings:
+    def __init__(self):
+        self.data = bytearray()
+
+    def add(self, value):
+        raw = (value or "").encode()
+        offset = len(self.data)
+        self.data += raw
+        return offset, len(raw)
+
+
+def _column_bytes(values):
+    column = array("i", values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def build_snapshot(conn, position, path=PATH):
+    """Write films and directors to `path`, atomically replacing the previous file.
+
+    position is the change feed position the catalogue was read at (see
+    changes.last_change); it is stored so the next build can tell whether
+    anything changed since.
+    """
+    strings = _Strings()
+    films = {name: [] for name in FILM_COLUMNS}
+    for row in conn.execute(FILMS_SQL):
+        films["id"].append(row.id)
+        films["annee"].append(row.annee)
+        films["duree"].append(row.duree)
+        films["id_director"].append(row.id_director if row.id_director is not None else NO_DIRECTOR)
+        offset, length = strings.add(row.titre)
+        films["titre_off"].append(offset)
+        films["titre_len"].append(length)
+
+    directors = {name: [] for name in DIRECTOR_COLUMNS}
+    for row in conn.execute(DIRECTORS_SQL):
+        directors["id"].append(row.id)
+        for field in ("name", "surname"):
+            offset, length = strings.add(getattr(row, field))
+            directors[f"{field}_off"].append(offset)
+            directors[f"{field}_len"].append(length)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, position, len(films["id"]), len(directors["id"]), len(strings.data)))
+        for name in FILM_COLUMNS:
+            f.write(_column_bytes(films[name]))
+        for name in DIRECTOR_COLUMNS:
+            f.write(_column_bytes(directors[name]))
+        f.write(strings.data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Workers keep reading the mapping of the old file until they remap
+    os.replace(tmp_path, path)
+    return len(films["id"]), len(directors["id"])
+
+
+def mark_fresh(path=PATH):
+    """Tell the readers the snapshot is still current.
+
+    A separate file, so the snapshot's own mtime only changes when it is
+    rebuilt and readers do not remap it after every check.
+    """
+    with open(f"{path}.fresh", "a"):
+        pass
+    os.utime(f"{path}.fresh")
+
+
+def file_version(stat):
+    """What changes when a file is replaced, even by one of the same size on a reused inode"""
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def read_position(path=PATH):
+    """Change feed position of the snapshot on disk, None without a valid file"""
+    try:
+        with open(path, "rb") as f:
+            magic, version, position, *_ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return position if magic == MAGIC and version == VERSION else None
+
+
+# --------------------------------------------------
+# Reader
+# --------------------------------------------------
+class _Mapping:
+    """One mapped snapshot file: int32 column views over the mmap and the string table"""
+
+    def __init__(self, f):
+        self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.position, films, directors, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or sys.byteorder != "little":
+            raise ValueError("unsupported catalogue snapshot")
+
+        view = memoryview(self.mm)
+        offset = HEADER.size
+        self.films = {}
+        for name in FILM_COLUMNS:
+            self.films[name] = view[offset:offset + films * 4].cast("i")
+            offset += films * 4
+        self.directors = {}
+        for name in DIRECTOR_COLUMNS:
+            self.directors[name] = view[offset:offset + directors * 4].cast("i")
+            offset += directors * 4
+        self.strings = view[offset:]
+
+    def string(self, offset, length):
+        return str(self.strings[offset:offset + length], "utf-8")
+
+    def _index(self, ids, key):
+        i = bisect_left(ids, key)
+        return i if i < len(ids) and ids[i] == key else None
+
+    def director(self, director_id):
+        d = self.directors
+        i = self._index(d["id"], director_id)
+        if i is None:
+            return None
+        return {
+            "id": d["id"][i],
+            "name": self.string(d["name_off"][i], d["name_len"][i]),
+            "surname": self.string(d["surname_off"][i], d["surname_len"][i]),
+        }
+
+    def film(self, film_id):
+        f = self.films
+        i = self._index(f["id"], film_id)
+        if i is None:
+            return None
+        id_director = f["id_director"][i]
+        id_director = None if id_director == NO_DIRECTOR else id_director
+        return {
+            "id": f["id"][i],
+            "titre": self.string(f["titre_off"][i], f["titre_len"][i]),
+            "annee": f["annee"][i],
+            "duree": f["duree"][i],
+            "id_director": id_director,
+            "director": self.director(id_director) if id_director is not None else None,
+        }
+
+    def all_directors(self):
+        return [self.director(director_id) for director_id in self.directors["id"]]
+
+
+class CatalogueSnapshot:
+    """Lazily mapped snapshot, remapped when the builder replaced the file.
+
+    Lookups return None when there is no usable snapshot, so callers fall back
+    to the database. The pages are shared by every process mapping the file.
+    """
+
+    def __init__(self, path=PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapping = None
+        self._version = None
+        self._pid = None
+        self._checked = 0.0
+
+    def current(self):
+        if not ENABLED:
+            return None
+        now = time.monotonic()
+        if self._pid == os.getpid() and now - self._checked < CHECK_SECONDS:
+            return self._mapping
+        with self._lock:
+            if self._pid != os.getpid() or now - self._checked >= CHECK_SECONDS:
+                self._checked = now
+                self._pid = os.getpid()
+                self._remap_if_replaced()
+        return self._mapping
+
+    def _remap_if_replaced(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._mapping, self._version = None, None
+            return
+        try:
+            fresh_at = max(stat.st_mtime, os.stat(f"{self.path}.fresh").st_mtime)
+        except OSError:
+            fresh_at = stat.st_mtime
+        if time.time() - fresh_at > MAX_AGE_SECONDS:
+            self._mapping, self._version = None, None
+            return
+        if file_version(stat) == self._version:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                mapping = _Mapping(f)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️ Catalogue snapshot unusable: {e}")
+            self._mapping, self._version = None, None
+            return
+        # The previous mapping is released once no request uses it any more
+        self._mapping, self._version = mapping, file_version(stat)
+
+    def film(self, film_id):
+        mapping = self.current()
+        return mapping.film(film_id) if mapping is not None else None
+
+    def directors(self):
+        mapping = self.current()
+        return mapping.all_directors() if mapping is not None else None
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module-level settings of the API, read at import: keep every shared file of
+# the test run in a directory of its own, and quotas out of the way
+_FILES = tempfile.mkdtemp(prefix="film_api_tests-")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("SESSION_DB", os.path.join(_FILES, "sessions.sqlite3"))
+os.environ.setdefault("DB_PRIMARY_PIN_DB", os.path.join(_FILES, "pins.sqlite3"))
+os.environ.setdefault("CATALOGUE_SNAPSHOT_PATH", os.path.join(_FILES, "catalogue.bin"))
+os.environ.setdefault("ANALYTICS_PATH", os.path.join(_FILES, "ratings.bin"))
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def app(tmp_path):
+    """appORM on a seeded SQLite file: 3 directors, 3 users, 3 films, 6 marks"""
+    import appORM
+
+    app = appORM.create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'film.db'}",
+        "SQLALCHEMY_BINDS": {},
+        "USERS": {},
+    })
+    with app.app_context():
+        appORM.db.create_all()
+        appORM.seed_initial_data()
+    appORM.ENTITY_CACHE.clear()
+    appORM.SESSIONS[TOKEN] = "john_doe"
+    yield app
+    appORM.SESSIONS.pop(TOKEN, None)
+    with app.app_context():
+        appORM.db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth():
+    return {"Authorization": f"Bearer {TOKEN}"}
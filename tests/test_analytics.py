@@ -0,0 +1,74 @@
+"""Ratings dataset (see analytics.py): aggregates checked against the marks in the database"""
+from collections import defaultdict
+from statistics import mean, pstdev
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import analytics
+import appORM
+
+
+@pytest.fixture
+def ratings(app, tmp_path):
+    path = str(tmp_path / "ratings.bin")
+    with app.app_context(), appORM.db.engine.connect() as conn:
+        assert analytics.build_dataset(conn, 0, path=path) == appORM.Mark.query.count()
+    return analytics.RatingsDataset(path).current()
+
+
+def expected(app, key):
+    """Votes and mean of every group, computed row by row"""
+    groups = defaultdict(list)
+    with app.app_context():
+        for mark in appORM.Mark.query.all():
+            film = appORM.db.session.get(appORM.Film, mark.id_film)
+            user = appORM.db.session.get(appORM.Utilisateur, mark.id_user)
+            groups[key(film, user)].append(mark.mark)
+    return {
+        k: {"votes": len(v), "mean": round(mean(v), 3), "stddev": round(pstdev(v), 3)}
+        for k, v in groups.items()
+    }
+
+
+@pytest.mark.parametrize("dense", [True, False])
+def test_aggregates_match_the_database(app, ratings, monkeypatch, dense):
+    if not dense:
+        monkeypatch.setattr(analytics, "MAX_DENSE_GROUPS", 0)
+    for group, key in [
+        ("film", lambda film, user: film.id),
+        ("director", lambda film, user: film.id_director),
+        ("langue", lambda film, user: user.langue),
+        ("decade", lambda film, user: film.annee // 10 * 10),
+    ]:
+        overall, total, groups = analytics.aggregate(ratings, group)
+        assert {g.pop("key"): g for g in groups} == expected(app, key)
+        assert total == len(groups)
+        assert overall["votes"] == ratings.count
+
+
+def test_filters_sort_and_min_votes(app, ratings):
+    by_film = expected(app, lambda film, user: film.id)
+    mask = analytics.select(ratings, director=1)
+    _, _, groups = analytics.aggregate(ratings, "film", mask, sort="mean")
+    assert [g["key"] for g in groups] == sorted((1, 3), key=lambda f: -by_film[f]["mean"])
+
+    _, total, groups = analytics.aggregate(ratings, "film", min_votes=3)
+    assert total == len(groups) == sum(1 for g in by_film.values() if g["votes"] >= 3)
+
+    assert not analytics.select(ratings, langue="klingon").any()
+    overall, total, groups = analytics.aggregate(ratings, "film", analytics.select(ratings, langue="klingon"))
+    assert (overall["votes"], total, groups) == (0, 0, [])
+
+
+def test_get_analytics(client, auth, app, tmp_path, monkeypatch, ratings):
+    monkeypatch.setattr(appORM.RATINGS, "current", lambda: ratings)
+    response = client.get("/analytics?group=film&histogram=1", headers=auth)
+    assert response.status_code == 200
+    groups = response.get_json()["groups"]
+    assert [sum(g["histogram"]) for g in groups] == [g["votes"] for g in groups]
+    assert client.get("/analytics?group=title", headers=auth).status_code == 400
+
+    monkeypatch.setattr(appORM.RATINGS, "current", lambda: None)
+    assert client.get("/analytics", headers=auth).status_code == 503
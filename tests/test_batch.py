@@ -0,0 +1,63 @@
+"""POST /batch (see appORM.batch): ordering, error isolation, pinning"""
+import pytest
+
+import appORM
+import routing
+
+
+def run(client, auth, requests, **options):
+    response = client.post("/batch", json={"requests": requests, **options}, headers=auth)
+    assert response.status_code == 200
+    return response, response.get_json()["responses"]
+
+
+def test_sequential_subrequests_see_earlier_writes(client, auth):
+    _, responses = run(client, auth, [
+        {"method": "POST", "path": "/directors", "body": {"name": "Agnès", "surname": "Varda"}},
+        {"method": "GET", "path": "/directors"},
+    ])
+    assert responses[0]["status"] == 201
+    assert "Varda" in [d["surname"] for d in responses[1]["body"]]
+
+
+def test_parallel_reads_keep_request_order(client, auth):
+    _, responses = run(client, auth, [{"path": f"/films/{i}"} for i in (3, 1, 2, 99)], parallel=True)
+    assert [r["status"] for r in responses] == [200, 200, 200, 404]
+    assert [r["body"].get("id") for r in responses[:3]] == [3, 1, 2]
+
+
+def test_a_failing_subrequest_does_not_affect_the_others(client, auth, monkeypatch):
+    def broken(film_id):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(appORM, "find_film", broken)
+    _, responses = run(client, auth, [
+        {"method": "POST", "path": "/directors", "body": {"name": "Jane", "surname": "Campion"}},
+        {"path": "/films/1"},
+        {"method": "POST", "path": "/marks", "body": {"id_film": "x", "id_user": 1, "mark": 5}},
+        {"path": "/login", "method": "POST"},
+        {"path": "films"},
+        {"path": "/directors"},
+    ])
+    assert [r["status"] for r in responses] == [201, 500, 400, 400, 400, 200]
+    assert "Campion" in [d["surname"] for d in responses[5]["body"]]
+
+
+@pytest.mark.parametrize("body", [{}, {"requests": []}, {"requests": [1]}, {"requests": [{"path": "/films"}] * 21}])
+def test_malformed_batch(client, auth, body):
+    assert client.post("/batch", json=body, headers=auth).status_code == 400
+
+
+def test_only_batches_with_a_write_pin_the_client(app, client, auth, monkeypatch):
+    pinned = []
+    monkeypatch.setattr(routing.PINS, "pin", lambda key, seconds: pinned.append(key))
+
+    response, _ = run(client, auth, [{"path": "/films/1"}, {"path": "/directors"}])
+    assert pinned == [] and "primary_pin" not in response.headers.get("Set-Cookie", "")
+
+    response, _ = run(client, auth, [{"method": "DELETE", "path": "/films/999"}])
+    assert pinned == []
+
+    response, _ = run(client, auth, [{"method": "POST", "path": "/directors", "body": {"name": "A", "surname": "B"}}])
+    assert pinned == [auth["Authorization"]]
+    assert "primary_pin" in response.headers["Set-Cookie"]
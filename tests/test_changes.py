@@ -0,0 +1,81 @@
+"""Change feed (see changes.py): pagination, expired positions, entity filter"""
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+import changes
+
+
+def all_pages(client, auth, since=0, limit=4, entity=None):
+    seen = []
+    while True:
+        query = f"/changes?since={since}&limit={limit}" + (f"&entity={entity}" if entity else "")
+        page = client.get(query, headers=auth).get_json()
+        seen += page["changes"]
+        since = page["next_since"]
+        if not page["has_more"]:
+            return seen, since
+
+
+def test_pages_cover_every_change_once_in_order(app, client, auth):
+    import appORM
+
+    with app.app_context():
+        total = appORM.Change.query.filter(appORM.Change.entity != "user").count()
+
+    seen, last = all_pages(client, auth)
+    seqs = [change["seq"] for change in seen]
+    assert len(seqs) == total
+    assert seqs == sorted(set(seqs))
+    assert last == seqs[-1]
+
+    # A new change shows up after the last position, and only it
+    client.post("/directors", json={"name": "Greta", "surname": "Gerwig"}, headers=auth)
+    newer, _ = all_pages(client, auth, since=last)
+    assert [(c["entity"], c["op"], c["data"]["surname"]) for c in newer] == [("director", "upsert", "Gerwig")]
+
+
+def test_entity_filter(client, auth):
+    seen, _ = all_pages(client, auth, entity="film")
+    assert {change["entity"] for change in seen} == {"film"}
+    assert len(seen) == 3
+
+
+def test_user_changes_are_not_published(app, client, auth):
+    import appORM
+
+    with app.app_context():
+        assert appORM.Change.query.filter_by(entity="user").count() == 3
+    seen, _ = all_pages(client, auth)
+    assert "user" not in {change["entity"] for change in seen}
+    assert client.get("/changes?entity=user", headers=auth).status_code == 400
+
+
+def test_pruned_position_answers_410(app, client, auth):
+    import appORM
+
+    first = client.get("/changes?limit=1", headers=auth).get_json()["changes"][0]["seq"]
+    with app.app_context():
+        appORM.Change.query.filter(appORM.Change.seq <= first).delete()
+        appORM.db.session.commit()
+
+    response = client.get(f"/changes?since={first}", headers=auth)
+    assert response.status_code == 410
+    assert client.get(f"/changes/stream?since={first}", headers=auth).status_code == 410
+
+
+def test_bad_parameters(client, auth):
+    assert client.get("/changes?since=-1", headers=auth).status_code == 400
+    assert client.get("/changes?limit=0", headers=auth).status_code == 400
+    assert client.get(f"/changes?limit={changes.PAGE_SIZE + 1}", headers=auth).status_code == 400
+
+
+def test_postgres_pages_stop_at_the_oldest_running_transaction():
+    import appORM
+
+    session = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=postgresql.dialect()))
+    query, postgres = changes._after(session, appORM.Change.__table__, 0, ["mark"])
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert postgres
+    assert "pg_snapshot_xmin(pg_current_snapshot())" in sql
+    assert "change_log.entity IN" in sql
@@ -0,0 +1,43 @@
+"""Smoke tests of the DATABASE_URL override and the SQLite pragmas (see database.py)"""
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+import database
+
+
+def test_database_url_prefers_database_url(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "sqlite:////data/film.db")
+    assert database.database_url("h", "5432", "film_db", "u", "p") == "sqlite:////data/film.db"
+
+
+def test_database_url_falls_back_to_postgres(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    assert database.database_url("h", "5432", "film_db", "u", "p") == "postgresql://u:p@h:5432/film_db"
+
+
+def test_engine_options_only_for_sqlite_files():
+    assert database.engine_options("postgresql://u:p@h/film_db") == {}
+    assert database.engine_options("sqlite://") == {}
+    options = database.engine_options("sqlite:////data/film.db")
+    assert "poolclass" not in options
+    assert options["connect_args"]["check_same_thread"] is False
+
+
+def test_sqlite_app_uses_pooled_wal_connections(monkeypatch, tmp_path):
+    path = tmp_path / "film.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    import appORM
+
+    app = appORM.create_app({"SQLALCHEMY_BINDS": {}, "USERS": {}})
+    assert app.config["SQLALCHEMY_DATABASE_URI"] == f"sqlite:///{path}"
+    with app.app_context():
+        engine = appORM.db.engine
+        assert isinstance(engine.pool, QueuePool)
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        appORM.db.create_all()
+        assert appORM.Film.query.count() == 0
+    assert path.exists()
@@ -0,0 +1,136 @@
+"""Write-behind marks (see ingest.py): batching, journals, replay of dead workers"""
+import fcntl
+import json
+import os
+
+import pytest
+
+import ingest
+
+
+@pytest.fixture
+def ingestor(app, tmp_path, monkeypatch):
+    import appORM
+
+    monkeypatch.setattr(ingest, "JOURNAL_DIR", str(tmp_path / "journal"))
+    monkeypatch.setattr(ingest, "DURABILITY", "journal")
+    # The background thread only replays; batches are flushed by the tests
+    monkeypatch.setattr(ingest, "FLUSH_INTERVAL", 3600)
+    monkeypatch.setattr(ingest, "BATCH_SIZE", 1000)
+    monkeypatch.setattr(ingest, "RETRY_DELAY", 0)
+    ingestor = ingest.MarkIngestor(appORM.db, appORM.Mark.__table__, appORM.Change.__table__)
+    yield ingestor
+    ingestor._pid = None  # stops the background thread
+
+
+def marks(app):
+    import appORM
+
+    with app.app_context():
+        return {(m.id_film, m.id_user): m.mark for m in appORM.Mark.query.all()}
+
+
+def write_journal(directory, journal_id, lines):
+    os.makedirs(directory, exist_ok=True)
+    open(os.path.join(directory, f"marks-{journal_id}.lock"), "a").close()
+    with open(os.path.join(directory, f"marks-{journal_id}-00000000.jsonl"), "w") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+
+def test_batch_keeps_the_last_mark_of_each_pair(app, ingestor):
+    import appORM
+
+    for id_film, id_user, mark in [(1, 1, 3), (1, 1, 4), (2, 2, 5)]:
+        assert ingestor.submit(app, id_film, id_user, mark)
+    assert ingestor.flush_once()
+
+    assert marks(app)[(1, 1)] == 4
+    assert marks(app)[(2, 2)] == 5
+    assert ingestor.flushed == 2
+    with app.app_context():
+        feed = appORM.Change.query.filter_by(entity="mark").order_by(appORM.Change.seq.desc()).limit(2).all()
+        assert {(c.data["id_film"], c.data["id_user"], c.data["mark"]) for c in feed} == {(1, 1, 4), (2, 2, 5)}
+
+
+def test_flushed_segments_are_deleted(app, ingestor):
+    ingestor.submit(app, 1, 1, 3)
+    journal = ingest._segment_path(ingestor._journal_id, 0)
+    with open(journal) as f:
+        assert json.loads(f.readline())[1:] == [1, 1, 3]
+
+    assert ingestor.flush_once()
+    assert not os.path.exists(journal)
+    assert os.path.exists(ingest._lock_path(ingestor._journal_id))
+
+    ingestor.flush_all()
+    assert os.listdir(ingest.JOURNAL_DIR) == []
+
+
+def test_rows_the_database_refuses_are_dropped(app, ingestor):
+    ingestor.submit(app, 999, 1, 5)  # no such film
+    ingestor.submit(app, 3, 3, 2)
+    assert ingestor.flush_once()
+
+    assert ingestor.dropped == 1
+    assert marks(app)[(3, 3)] == 2
+    assert (999, 1) not in marks(app)
+
+
+def test_replay_merges_dead_journals_by_time(app, ingestor):
+    write_journal(ingest.JOURNAL_DIR, "101.dead", [[10.0, 1, 1, 1], [30.0, 2, 2, 3]])
+    write_journal(ingest.JOURNAL_DIR, "102.dead", [[20.0, 1, 1, 2], [5.0, 2, 2, 9]])
+    with open(os.path.join(ingest.JOURNAL_DIR, "marks-102.dead-00000000.jsonl"), "a") as f:
+        f.write('[40.0, 1, 1')  # torn by the crash
+
+    with app.app_context():
+        ingestor._replay_orphan_journals()
+
+    assert marks(app)[(1, 1)] == 2
+    assert marks(app)[(2, 2)] == 3
+    assert os.listdir(ingest.JOURNAL_DIR) == []
+
+
+def test_replay_skips_journals_of_live_workers(app, ingestor):
+    write_journal(ingest.JOURNAL_DIR, "103.alive", [[10.0, 3, 3, 1]])
+    lock = open(os.path.join(ingest.JOURNAL_DIR, "marks-103.alive.lock"), "a")
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+        with app.app_context():
+            ingestor._replay_orphan_journals()
+    finally:
+        lock.close()
+
+    assert (3, 3) not in marks(app)
+    assert len(os.listdir(ingest.JOURNAL_DIR)) == 2
+
+
+def test_failed_batch_goes_back_to_the_queue(app, ingestor, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    ingestor.submit(app, 1, 2, 6)
+
+    def unreachable(*args, **kwargs):
+        raise OperationalError("UPSERT", {}, Exception("server closed the connection"))
+
+    with monkeypatch.context() as m:
+        m.setattr(ingest, "upsert_marks", unreachable)
+        assert not ingestor.flush_once()
+    assert ingestor.stats()["queued"] == 1
+    assert os.path.exists(ingest._segment_path(ingestor._journal_id, 0))
+
+    assert ingestor.flush_once()
+    assert marks(app)[(1, 2)] == 6
+    assert not os.path.exists(ingest._segment_path(ingestor._journal_id, 0))
+
+
+def test_lock_of_a_deleted_file_is_refused(tmp_path, monkeypatch):
+    path = str(tmp_path / "marks-x.lock")
+    flock = fcntl.flock
+
+    def replayed_meanwhile(f, operation):
+        os.remove(path)
+        flock(f, operation)
+
+    monkeypatch.setattr(fcntl, "flock", replayed_meanwhile)
+    assert ingest._lock_journal(path, fcntl.LOCK_EX) is None
@@ -0,0 +1,40 @@
+"""GET /search on SQLite (search.search_like): cursor pages"""
+import pytest
+
+import search
+
+
+def hits(item):
+    return item["type"], (item.get("film") or item.get("profile"))["id"]
+
+
+def test_pages_cover_every_hit_once(client, auth):
+    everything = client.get("/search?q=IN", headers=auth).get_json()
+    assert everything["next_cursor"] is None
+    expected = [hits(item) for item in everything["items"]]
+    assert len(expected) == len(set(expected)) >= 3
+
+    seen, cursor = [], None
+    while True:
+        url = "/search?q=IN&limit=1" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=auth).get_json()
+        seen += [hits(item) for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_like_wildcards_are_literal(client, auth):
+    assert client.get("/search?q=%25", headers=auth).get_json()["items"] == []
+    assert client.get("/search?q=_", headers=auth).get_json()["items"] == []
+
+
+def test_cursor_round_trip():
+    assert search.decode_cursor(search.encode_cursor(0.25, "film", 7)) == (0.25, "film", 7)
+
+
+@pytest.mark.parametrize("query", ["", "q=in&type=director", "q=in&limit=0", "q=in&cursor=nope",
+                                   f"q=in&cursor={search.encode_cursor(1, 'user', 1)}"])
+def test_bad_params(client, auth, query):
+    assert client.get(f"/search?{query}", headers=auth).status_code == 400
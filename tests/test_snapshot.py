@@ -0,0 +1,71 @@
+"""Catalogue snapshot (see snapshot.py): encoding, lookups, replacement"""
+import os
+
+import pytest
+
+import snapshot
+
+
+@pytest.fixture
+def built(app, tmp_path):
+    """Build the snapshot of the seeded catalogue, plus a film without director and a non-ASCII title"""
+    import appORM
+
+    with app.app_context():
+        appORM.db.session.add_all([
+            appORM.Film(titre="Sans réalisateur", annee=1950, duree=90),
+            appORM.Film(titre="東京物語 — Tōkyō", annee=1953, duree=136, id_director=2),
+        ])
+        appORM.db.session.commit()
+    path = str(tmp_path / "catalogue.bin")
+    with app.app_context(), appORM.db.engine.connect() as conn:
+        assert snapshot.build_snapshot(conn, 42, path=path) == (5, 3)
+    return path
+
+
+def test_round_trip_matches_the_database(app, built):
+    import appORM
+
+    mapped = snapshot.CatalogueSnapshot(built)
+    with app.app_context():
+        for film in appORM.Film.query.all():
+            assert mapped.film(film.id) == film.to_dict()
+        assert mapped.directors() == [d.to_dict() for d in appORM.Director.query.order_by(appORM.Director.id)]
+    assert mapped.film(999) is None
+    assert mapped.film(0) is None
+    assert snapshot.read_position(built) == 42
+
+
+def test_rebuilt_file_of_the_same_size_is_remapped(app, built, monkeypatch):
+    import appORM
+
+    monkeypatch.setattr(snapshot, "CHECK_SECONDS", 0)
+    mapped = snapshot.CatalogueSnapshot(built)
+    assert mapped.film(1)["titre"] == "Inception"
+
+    with app.app_context():
+        appORM.db.session.get(appORM.Film, 1).titre = "Inceptiom"
+        appORM.db.session.commit()
+        with appORM.db.engine.connect() as conn:
+            snapshot.build_snapshot(conn, 43, path=built)
+    assert mapped.film(1)["titre"] == "Inceptiom"
+
+
+def test_stale_snapshot_is_not_used(built, monkeypatch):
+    monkeypatch.setattr(snapshot, "CHECK_SECONDS", 0)
+    old = os.stat(built).st_mtime - snapshot.MAX_AGE_SECONDS - 1
+    os.utime(built, (old, old))
+    mapped = snapshot.CatalogueSnapshot(built)
+    assert mapped.film(1) is None
+
+    # The worker checked: nothing changed since the build
+    snapshot.mark_fresh(built)
+    assert mapped.film(1)["titre"] == "Inception"
+
+
+def test_unusable_file_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "CHECK_SECONDS", 0)
+    path = tmp_path / "catalogue.bin"
+    path.write_bytes(b"not a snapshot")
+    assert snapshot.CatalogueSnapshot(str(path)).film(1) is None
+    assert snapshot.read_position(str(path)) is None
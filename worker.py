@@ -0,0 +1,276 @@
+import json
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+import analytics
+import changes
+from appORM import create_app, db, Change, Job, Utilisateur, Director, Film, Mark, init_db, seed_initial_data
+from directorstats import REFRESH_SECONDS as DIRECTOR_STATS_REFRESH_SECONDS, refresh_director_stats
+from partitions import detach_old_mark_partitions, ensure_mark_partitions
+import snapshot
+
+# --------------------------------------------------
+# Configuration
+# --------------------------------------------------
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# A running job whose lease expired (worker crash) is picked up again; the
+# worker running it renews the lease every third of it
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+RETRY_DELAY_SECONDS = int(os.getenv("JOB_RETRY_DELAY_SECONDS", "30"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+PARTITION_CHECK_SECONDS = int(os.getenv("MARK_PARTITION_CHECK_SECONDS", "3600"))
+
+EXPORT_MODELS = {
+    "users": Utilisateur,
+    "directors": Director,
+    "films": Film,
+    "marks": Mark,
+}
+
+
+# --------------------------------------------------
+# Job handlers
+# --------------------------------------------------
+def run_seed(payload):
+    return {"seeded": seed_initial_data()}
+
+
+def run_export(payload):
+    """Stream a whole table to a JSON file without loading it in memory"""
+    table = payload["table"]
+    model = EXPORT_MODELS[table]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{table}-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    # Only a complete export ever has the .json name
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    rows = 0
+    try:
+        with open(tmp_path, "w") as f:
+            f.write("[")
+            for row in model.query.order_by(model.id).yield_per(1000):
+                f.write(("," if rows else "") + json.dumps(row.to_dict()))
+                rows += 1
+            f.write("]")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return {"path": path, "rows": rows}
+
+
+HANDLERS = {
+    "seed": run_seed,
+    "export": run_export,
+}
+
+
+def maintain_partitions():
+    """Create the coming monthly mark partitions, detach the expired ones"""
+    if db.engine.dialect.name != "postgresql":
+        return
+    with db.engine.begin() as conn:
+        created = ensure_mark_partitions(conn)
+    if created is None:
+        print("⚠️ mark is not partitioned, skipping partition maintenance")
+        return
+    for name in created:
+        print(f"🗄️ Created mark partition {name}")
+    for name in detach_old_mark_partitions(db.engine):
+        print(f"🗄️ Detached mark partition {name}")
+
+
+def refresh_snapshot():
+    """Rebuild the catalogue snapshot when a film or director changed since the last build"""
+    position = snapshot.read_position()
+    try:
+        latest = changes.last_change(db.session, Change.__table__, position or 0, ["film", "director"])
+    except changes.ExpiredPosition:
+        latest = changes.last_change(db.session, Change.__table__, 0, ["film", "director"])
+        position = None
+    db.session.rollback()
+    if position is not None and latest is None:
+        snapshot.mark_fresh()
+        return
+
+    # Read after the position: the file holds at least every change up to it
+    with db.engine.connect() as conn:
+        films, directors = snapshot.build_snapshot(conn, latest or position or 0)
+    print(f"📸 Catalogue snapshot rebuilt: {films} films, {directors} directors")
+
+
+def refresh_analytics():
+    """Rebuild the ratings dataset when a mark, film or user (langue) changed since the last build"""
+    entities = ["mark", "film", "user"]
+    position = analytics.read_position()
+    try:
+        latest = changes.last_change(db.session, Change.__table__, position or 0, entities)
+    except changes.ExpiredPosition:
+        latest = changes.last_change(db.session, Change.__table__, 0, entities)
+        position = None
+    db.session.rollback()
+    if position is not None and latest is None:
+        return
+
+    with db.engine.connect() as conn:
+        count = analytics.build_dataset(conn, latest or position or 0)
+    print(f"📊 Ratings dataset rebuilt: {count} marks")
+
+
+# --------------------------------------------------
+# Worker loop
+# --------------------------------------------------
+def claim_job():
+    """Lock the next due job; concurrent workers skip rows already locked"""
+    while True:
+        now = datetime.utcnow()
+        job = (
+            Job.query.filter(Job.status.in_(["pending", "running"]), Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.session.rollback()
+            return None
+        if job.status == "pending" or job.attempts < job.max_attempts:
+            break
+        # Its lease expired on every attempt: the job keeps killing the worker
+        job.status = "failed"
+        job.error = f"Worker lost during each of {job.attempts} attempts"
+        db.session.commit()
+        print(f"❌ Job {job.id} ({job.kind}) failed: {job.error}")
+
+    job.status = "running"
+    job.attempts += 1
+    job.run_after = now + timedelta(seconds=LEASE_SECONDS)
+    db.session.commit()
+    return job
+
+
+@contextmanager
+def lease_renewed(job_id):
+    """Keep pushing the lease of a running job forward while the body runs.
+
+    A job longer than LEASE_SECONDS is then never claimed by a second worker
+    while this one is alive; only a dead worker lets its lease expire.
+    """
+    app = current_app._get_current_object()
+    done = threading.Event()
+
+    def renew():
+        with app.app_context():
+            while not done.wait(LEASE_SECONDS / 3):
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(
+                            Job.__table__.update()
+                            .where(Job.id == job_id, Job.status == "running")
+                            .values(run_after=datetime.utcnow() + timedelta(seconds=LEASE_SECONDS))
+                        )
+                except Exception as e:
+                    print(f"⚠️ Could not renew the lease of job {job_id}: {e}")
+
+    thread = threading.Thread(target=renew, name=f"job-{job_id}-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        with lease_renewed(job.id):
+            result = handler(job.payload or {})
+    except Exception as e:
+        db.session.rollback()
+        job = Job.query.get(job.id)
+        job.error = str(e)
+        if job.attempts < job.max_attempts and handler is not None:
+            job.status = "pending"
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_DELAY_SECONDS * job.attempts)
+        else:
+            job.status = "failed"
+        db.session.commit()
+        print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+        return
+
+    job.status = "done"
+    job.result = result
+    job.error = None
+    db.session.commit()
+    print(f"✅ Job {job.id} ({job.kind}) done")
+
+
+def run_worker():
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    app = create_app()
+    init_db(app)
+    with app.app_context():
+        print("👷 Job worker started")
+        next_maintenance = 0
+        next_stats_refresh = 0
+        next_snapshot_check = 0
+        next_analytics_refresh = 0
+        while not stopping:
+            if time.monotonic() >= next_maintenance:
+                try:
+                    maintain_partitions()
+                except Exception as e:
+                    print(f"❌ Partition maintenance failed: {e}")
+                try:
+                    pruned = changes.prune(db.engine, Change.__table__)
+                    if pruned:
+                        print(f"🧹 Pruned {pruned} changes older than {changes.RETENTION_DAYS} days")
+                except Exception as e:
+                    print(f"❌ Change log pruning failed: {e}")
+                next_maintenance = time.monotonic() + PARTITION_CHECK_SECONDS
+
+            if db.engine.dialect.name == "postgresql" and time.monotonic() >= next_stats_refresh:
+                try:
+                    refresh_director_stats(db.engine)
+                except Exception as e:
+                    print(f"❌ Director stats refresh failed: {e}")
+                next_stats_refresh = time.monotonic() + DIRECTOR_STATS_REFRESH_SECONDS
+
+            if snapshot.ENABLED and time.monotonic() >= next_snapshot_check:
+                try:
+                    refresh_snapshot()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Catalogue snapshot rebuild failed: {e}")
+                next_snapshot_check = time.monotonic() + snapshot.CHECK_SECONDS
+
+            if analytics.ENABLED and analytics.np is not None and time.monotonic() >= next_analytics_refresh:
+                try:
+                    refresh_analytics()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Ratings dataset rebuild failed: {e}")
+                next_analytics_refresh = time.monotonic() + analytics.REFRESH_SECONDS
+
+            job = claim_job()
+            if job is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            run_job(job)
+            db.session.remove()
+
+
+if __name__ == "__main__":
+    run_worker()